@@ -1,28 +1,57 @@
 import os
-from fastapi import APIRouter, HTTPException, Depends, status
+import time
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pymongo import MongoClient
 from models.user import UserCreate, UserLogin
-from utils.auth import get_password_hash, verify_password, create_access_token, decode_access_token
-from dotenv import load_dotenv
-from bson import ObjectId
-
-load_dotenv()
+from utils import db
+from utils.auth import get_password_hash, verify_password, create_access_token, decode_access_token_payload
+from utils.admission import controllers as admission_controllers
+from utils.cache import LRUTTLCache
+from utils.uploads import check_batch_size
 
 router = APIRouter()
 
-# MongoDB setup
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client["llm_chatbot"]
-user_collection = db["users"]
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
+# Decoded token -> user document (password hash excluded), so a burst of
+# authenticated calls from one session costs a single MongoDB lookup.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+user_cache = LRUTTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS, name="users")
+
+
+def invalidate_cached_user(username: str) -> None:
+    """Forget every cached session of ``username`` after the user document changes."""
+    user_cache.discard_where(lambda _token, user: user["username"] == username)
+
+
+async def load_user_for_token(token: str) -> Optional[dict]:
+    """Resolve a bearer token to its user document (without password), using the cache.
+
+    Returns None when the token is invalid or expired; raises 404 if the user is gone.
+    """
+    user_data = user_cache.get(token)
+    if user_data is None:
+        payload = decode_access_token_payload(token)
+        if payload is None:
+            return None
+
+        user_data = await db.users().find_one({"username": payload["sub"]}, {"password": 0})
+        if not user_data:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Never serve a cached user past the token's own expiry
+        expires_in = payload["exp"] - time.time() if "exp" in payload else None
+        user_cache.set(token, user_data, ttl=expires_in)
+
+    return dict(user_data)
+
 
 # ✅ Register New User
 @router.post("/register")
 async def register(user: UserCreate):
-    existing_user = user_collection.find_one({"username": user.username})
+    existing_user = await db.users().find_one({"username": user.username})
 
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
@@ -33,7 +62,8 @@ async def register(user: UserCreate):
         "email": user.email,
         "password": hashed_password,
     }
-    user_collection.insert_one(user_data)
+    await db.users().insert_one(user_data)
+    invalidate_cached_user(user.username)
     return {"message": "User registered successfully"}
 
 
@@ -41,7 +71,7 @@ async def register(user: UserCreate):
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     print("==> Login api called...")
-    user_data = user_collection.find_one(
+    user_data = await db.users().find_one(
         {"$or": [{"username": form_data.username}, {"email": form_data.username}]}
     )
 
@@ -54,32 +84,61 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 # ✅ Get Current User from Token
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    username = decode_access_token(token)
+    user_data = await load_user_for_token(token)
 
-    if username is None:
+    if user_data is None:
         raise HTTPException(status_code=401, detail="Invalid token or token expired")
 
-    user_data = user_collection.find_one({"username": username})
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-
     return user_data
 
 
+def admission(kind: str):
+    """Dependency holding one of the current user's ``kind`` admission slots while the endpoint runs.
+
+    Rejects with 429 (user over rate or concurrency limit) or 503 (server busy).
+    """
+    controller = admission_controllers[kind]
+
+    async def admitted(current_user: dict = Depends(get_current_user)):
+        ticket = await controller.acquire(current_user["username"])
+        try:
+            yield ticket
+        finally:
+            await controller.release(ticket)
+
+    return admitted
+
+
+def batch_admission(kind: str, concurrency: int):
+    """``admission`` for a batch upload, sized by its file count.
+
+    Every file costs a rate-limit token, and the batch holds one slot per file
+    it processes at once (at most ``concurrency``).
+    """
+    controller = admission_controllers[kind]
+
+    async def admitted(files: List[UploadFile], current_user: dict = Depends(get_current_user)):
+        check_batch_size(files)
+        ticket = await controller.acquire(
+            current_user["username"], slots=min(len(files), concurrency), tokens=len(files)
+        )
+        try:
+            yield ticket
+        finally:
+            await controller.release(ticket)
+
+    return admitted
+
+
 @router.get("/verify-token")
 async def verify_token(token: str = Depends(oauth2_scheme)):
     try:
         print("==> Verifying token...")
-        username = decode_access_token(token)
+        user_data = await load_user_for_token(token)  # Password is never loaded
 
-        if username is None:
+        if user_data is None:
             raise HTTPException(status_code=401, detail="Invalid token or token expired")
 
-        user_data = user_collection.find_one({"username": username}, {"password": 0})  # Exclude password
-
-        if not user_data:
-            raise HTTPException(status_code=404, detail="User not found")
-
         # ✅ Return user details except password with isValid flag
         user_data["_id"] = str(user_data["_id"])  # Convert ObjectId to string
         return {
@@ -1,16 +1,26 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from pymongo import MongoClient
-from api.v1.auth import get_current_user
-from utils.llm import query_llm
+from starlette.background import BackgroundTask
+from api.v1.auth import admission, get_current_user
+from utils import db, answer_cache, transcript_store
+from utils.admission import controllers as admission_controllers
+from utils.batching import error_status, map_bounded
+from utils.llm import query_llm, stream_llm, HF_API_URL, GENERATION_PARAMETERS, RETRYABLE_STATUSES, LLMError, LLMTimeoutError, LLMUpstreamError
+from utils.llm_router import REMOTE, route_answer
+from utils.retrieval import index_transcript, select_contexts, TOP_K, CONTEXT_TOKEN_BUDGET
 
 router = APIRouter()
 
-# MongoDB setup
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client["llm_chatbot"]
-transcription_collection = db["transcriptions"]
+# Everything besides the question and transcript that shapes an answer
+ANSWER_PARAMETERS = {**GENERATION_PARAMETERS, "top_k": TOP_K, "context_tokens": CONTEXT_TOKEN_BUDGET}
+
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "20"))
+# Questions of one /chat/batch request sent to the LLM at the same time
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "5"))
 
 # Request model
 class ChatRequest(BaseModel):
@@ -18,22 +28,221 @@ class ChatRequest(BaseModel):
     question: str
 
 
+class ChatBatchRequest(BaseModel):
+    transcript_id: str
+    questions: List[str]
+
+
 @router.post("/chat")
-async def ask_question(request: ChatRequest, current_user=Depends(get_current_user)):
+async def ask_question(request: ChatRequest, current_user=Depends(get_current_user), admission_ticket=Depends(admission("chat"))):
     try:
-        # Fetch the transcript from MongoDB
-        transcript_entry = transcription_collection.find_one({"transcript_id": request.transcript_id})
+        # ✅ Repeated questions are served from the answer cache; concurrent
+        # identical questions share one LLM call
+        answer = await answer_cache.get_or_compute(
+            request.transcript_id,
+            current_user["username"],
+            request.question,
+            HF_API_URL,
+            ANSWER_PARAMETERS,
+            lambda: answer_question(request.transcript_id, current_user["username"], request.question),
+        )
 
-        if not transcript_entry:
-            raise HTTPException(status_code=404, detail="Transcript not found")
+        # Return the question and answer
+        return {"question": request.question, "answer": answer}
 
-        transcript_text = transcript_entry["transcript"]
+    except HTTPException:
+        raise
+    except LLMError as e:
+        raise llm_http_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during LLM query: {str(e)}")
 
-        # ✅ Call Deepgram Nova API to get the answer
-        answer = await query_llm(transcript_text, request.question)
 
-        # Return the question and answer
-        return {"question": request.question, "answer": answer}
+@router.post("/chat/batch")
+async def ask_questions(
+    request: ChatBatchRequest,
+    backend: str = Query("auto", pattern="^(auto|remote|local)$"),
+    current_user=Depends(get_current_user),
+    admission_ticket=Depends(admission("chat")),
+):
+    """Answer several questions about one transcript; answers come back in question order.
+
+    The transcript's index is read once for all questions, which are then
+    answered concurrently. A question that fails gets an error entry without
+    failing the rest. ``backend=local`` submits them to the local QA model
+    together so they share forward passes; ``remote`` skips routing.
+    """
+    if not request.questions or len(request.questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Send between 1 and {CHAT_BATCH_MAX_QUESTIONS} questions per batch")
+
+    try:
+        # ✅ One context lookup for every question
+        contexts = await load_contexts(request.transcript_id, current_user["username"], request.questions)
 
+        outcomes = await map_bounded(
+            lambda pair: answer_batch_question(request.transcript_id, current_user["username"], pair[0], pair[1], backend),
+            list(zip(request.questions, contexts)),
+            # The local model batches whatever is submitted together, so submit all at once
+            len(request.questions) if backend == "local" else CHAT_BATCH_CONCURRENCY,
+        )
+
+        results = []
+        for question, outcome in zip(request.questions, outcomes):
+            if isinstance(outcome, LLMError):
+                outcome = llm_http_error(outcome)
+            if isinstance(outcome, BaseException):
+                results.append({"question": question, **error_status(outcome)})
+            else:
+                results.append({"question": question, "status": "ok", "answer": outcome})
+
+        succeeded = sum(1 for result in results if result["status"] == "ok")
+        return {"transcript_id": request.transcript_id, "succeeded": succeeded,
+                "failed": len(results) - succeeded, "results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during LLM query: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def ask_question_stream(
+    request: ChatRequest,
+    backend: str = Query("remote", pattern="^(remote|local)$"),
+    current_user=Depends(get_current_user),
+):
+    """Like /chat, but answer tokens are sent as server-sent events as they arrive.
+
+    Events: ``token`` ({"text"}), then ``done`` ({"question", "answer"}) or ``error`` ({"detail"}).
+    ``backend=local`` uses the local extractive QA model instead of the HTTP endpoint.
+    """
+    # The slot has to outlive this function (the answer is generated while
+    # streaming), so it is taken here and given back once the response is done
+    controller = admission_controllers["chat"]
+    ticket = await controller.acquire(current_user["username"])
+    try:
+        cached = None
+        if backend == "remote":
+            cached = await answer_cache.lookup(
+                request.transcript_id, current_user["username"], request.question, HF_API_URL, ANSWER_PARAMETERS
+            )
+
+        # Resolve the context before streaming starts so a missing transcript is a plain 404
+        transcript_text = None if cached is not None else await load_context(
+            request.transcript_id, current_user["username"], request.question
+        )
+
+    except HTTPException:
+        await controller.release(ticket)
+        raise
     except Exception as e:
+        await controller.release(ticket)
         raise HTTPException(status_code=500, detail=f"Error during LLM query: {str(e)}")
+
+    return StreamingResponse(
+        stream_answer_events(request, current_user["username"], backend, transcript_text, cached),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(controller.release, ticket),
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer_events(request: ChatRequest, user_id: str, backend: str, transcript_text, cached):
+    # Starlette cancels this generator when the client disconnects, which
+    # closes the upstream stream and stops generation there too
+    if cached is not None:
+        yield sse_event("token", {"text": cached})
+        yield sse_event("done", {"question": request.question, "answer": cached})
+        return
+
+    if backend == "local":
+        from utils.llm2 import stream_llm2 as stream  # Loads the local model on first use
+    else:
+        stream = stream_llm
+
+    parts = []
+    try:
+        async for text in stream(transcript_text, request.question):
+            parts.append(text)
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        # Headers are already sent, so errors travel in-band
+        yield sse_event("error", {"detail": f"Error during LLM query: {str(e)}"})
+        return
+
+    answer = "".join(parts).strip()
+    if backend == "remote":
+        await answer_cache.store(request.transcript_id, user_id, request.question, HF_API_URL, ANSWER_PARAMETERS, answer)
+    yield sse_event("done", {"question": request.question, "answer": answer})
+
+
+def llm_http_error(error: LLMError) -> HTTPException:
+    """Map an inference backend failure onto a gateway-style HTTP error."""
+    if isinstance(error, LLMTimeoutError):
+        return HTTPException(status_code=504, detail=str(error))
+    if isinstance(error, LLMUpstreamError) and error.status in RETRYABLE_STATUSES:
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
+    return HTTPException(status_code=502, detail=str(error))
+
+
+async def load_contexts(transcript_id: str, user_id: str, questions: List[str]) -> List[str]:
+    """Passages of ``user_id``'s transcript relevant to each question; 404 if they have no such transcript."""
+    # ✅ Only the chunks relevant to the question go into the prompt
+    contexts = await select_contexts(transcript_id, user_id, questions)
+
+    if contexts is None:
+        # Transcript stored before retrieval indexing existed: index it once now
+        transcript_entry = await db.transcriptions().find_one(
+            {"transcript_id": transcript_id, "user_id": user_id},
+            {"transcript_id": 1, "user_id": 1, "page_offsets": 1, "transcript": 1},
+        )
+
+        if not transcript_entry:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+
+        await index_transcript(
+            transcript_id,
+            transcript_entry.get("user_id"),
+            await transcript_store.load_text(transcript_entry),
+            transcript_entry.get("page_offsets"),
+        )
+        contexts = await select_contexts(transcript_id, user_id, questions) or [""] * len(questions)
+
+    return contexts
+
+
+async def load_context(transcript_id: str, user_id: str, question: str) -> str:
+    """Passages of ``user_id``'s transcript relevant to ``question``; 404 if they have no such transcript."""
+    return (await load_contexts(transcript_id, user_id, [question]))[0]
+
+
+async def answer_from_context(transcript_text: str, question: str) -> str:
+    # ✅ Call the LLM to get the answer, hedged against the local QA model when it's slow or failing
+    routed = await route_answer(transcript_text, question)
+
+    # The cache is keyed by the remote model, so answers from the local one aren't kept
+    return routed.answer if routed.backend == REMOTE else answer_cache.Uncached(routed.answer)
+
+
+async def answer_question(transcript_id: str, user_id: str, question: str) -> str:
+    transcript_text = await load_context(transcript_id, user_id, question)
+    return await answer_from_context(transcript_text, question)
+
+
+async def answer_batch_question(transcript_id: str, user_id: str, question: str, transcript_text: str, backend: str) -> str:
+    """One question of a /chat/batch request, with its context already selected."""
+    if backend == "local":
+        from utils.llm2 import answer_span  # Loads the local model on first use
+
+        return await answer_span(transcript_text, question)
+
+    answer = query_llm if backend == "remote" else answer_from_context
+    # Repeated questions, in this batch or earlier ones, share the /chat answer cache
+    return await answer_cache.get_or_compute(
+        transcript_id, user_id, question, HF_API_URL, ANSWER_PARAMETERS, lambda: answer(transcript_text, question)
+    )
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from api.v1.auth import get_current_user
+from utils import jobs
+
+router = APIRouter()
+
+
+# ✅ Poll the status / result of an async transcription or PDF job
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Job status; a finished job's result has the ``transcript_id`` to read the text from /transcripts."""
+    job = await jobs.get_job(job_id, current_user["username"])
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
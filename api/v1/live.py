@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, WebSocket
+from api.v1.auth import load_user_for_token
+from utils import db, transcript_store
+from utils.admission import controllers as admission_controllers
+from utils.asr import SUMMARY_NOT_AVAILABLE, connect_live, live_options
+from utils.retrieval import try_index_transcript
+
+router = APIRouter()
+
+# Results waiting to be sent to a client; interim results are dropped when it's full
+LIVE_CLIENT_QUEUE_SIZE = int(os.getenv("LIVE_CLIENT_QUEUE_SIZE", "64"))
+# A client that can't take a final result within this long is disconnected
+LIVE_SEND_TIMEOUT_SECONDS = float(os.getenv("LIVE_SEND_TIMEOUT_SECONDS", "10"))
+# Deepgram closes idle streams after ~10 s without audio
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "5"))
+LIVE_FINALIZE_TIMEOUT_SECONDS = float(os.getenv("LIVE_FINALIZE_TIMEOUT_SECONDS", "10"))
+
+# WebSocket close codes
+POLICY_VIOLATION = 1008
+TRY_AGAIN_LATER = 1013
+
+
+class LiveSession:
+    """Relays one client's audio to Deepgram and Deepgram's results back to the client.
+
+    Three tasks run side by side: audio client -> Deepgram, results Deepgram ->
+    outbox, and outbox -> client. Final segments are kept for the stored
+    transcript.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=LIVE_CLIENT_QUEUE_SIZE)
+        self.finals: List[str] = []
+        self.audio_bytes = 0
+        self.dropped_interim = 0
+        self.client_gone = False
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self.finals)
+
+    async def run(self, upstream) -> None:
+        sender = asyncio.create_task(self._send_to_client())
+        audio = asyncio.create_task(self._relay_audio(upstream))
+        results = asyncio.create_task(self._relay_results(upstream))
+        try:
+            done, _ = await asyncio.wait({audio, results}, return_when=asyncio.FIRST_COMPLETED)
+            if audio in done:
+                audio.result()
+                # Ask Deepgram to flush what it has; it sends the last results, then closes
+                await upstream.send(json.dumps({"type": "CloseStream"}))
+                await asyncio.wait_for(results, LIVE_FINALIZE_TIMEOUT_SECONDS)
+            else:
+                results.result()
+        finally:
+            for task in (audio, results):
+                task.cancel()
+            await asyncio.gather(audio, results, return_exceptions=True)
+            await self._stop_sender(sender)
+
+    async def _relay_audio(self, upstream) -> None:
+        while True:
+            try:
+                message = await asyncio.wait_for(self.websocket.receive(), LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await upstream.send(json.dumps({"type": "KeepAlive"}))
+                continue
+
+            if message["type"] == "websocket.disconnect":
+                self.client_gone = True
+                return
+            if message.get("bytes"):
+                self.audio_bytes += len(message["bytes"])
+                await upstream.send(message["bytes"])
+            elif message.get("text"):
+                control = json.loads(message["text"])
+                if control.get("type") == "CloseStream":
+                    return
+                if control.get("type") == "Finalize":
+                    await upstream.send(json.dumps(control))
+
+    async def _relay_results(self, upstream) -> None:
+        async for raw in upstream:
+            message = json.loads(raw)
+            if message.get("type") != "Results":
+                continue
+
+            text = message["channel"]["alternatives"][0].get("transcript", "")
+            if not text:
+                continue
+            is_final = bool(message.get("is_final"))
+            if is_final:
+                self.finals.append(text)
+            await self.deliver({
+                "type": "final" if is_final else "interim",
+                "transcript": text,
+                "start": message.get("start"),
+                "duration": message.get("duration"),
+                "speech_final": bool(message.get("speech_final")),
+            }, droppable=not is_final)
+
+    async def deliver(self, message: dict, droppable: bool = False) -> None:
+        """Queue a message for the client without letting a slow client stall the relay.
+
+        Interim results are superseded by the next one, so they are dropped when
+        the client falls behind; finals wait, and a client that stays stuck is
+        disconnected (its transcript is still stored).
+        """
+        if self.client_gone:
+            return
+        if droppable:
+            try:
+                self.outbox.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped_interim += 1
+            return
+        try:
+            await asyncio.wait_for(self.outbox.put(message), LIVE_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.client_gone = True
+            await self.websocket.close(code=TRY_AGAIN_LATER, reason="Client too slow to receive results")
+
+    async def _send_to_client(self) -> None:
+        while True:
+            message = await self.outbox.get()
+            if message is None:
+                return
+            try:
+                await self.websocket.send_json(message)
+            except Exception:
+                self.client_gone = True
+                return
+
+    async def _stop_sender(self, sender: asyncio.Task) -> None:
+        if self.client_gone:
+            sender.cancel()
+        else:
+            # Let the client receive everything already queued
+            await self.outbox.put(None)
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+async def authenticate_websocket(websocket: WebSocket, token: Optional[str]) -> Optional[dict]:
+    """Same check as get_current_user, with the token from ``?token=`` or an Authorization header.
+
+    Browsers can't set headers on WebSocket requests, hence the query parameter.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):]
+    if not token:
+        return None
+    try:
+        return await load_user_for_token(token)
+    except HTTPException:
+        return None
+
+
+async def save_live_transcript(transcript_id: str, user_id: str, filename: str, text: str) -> None:
+    """Store a finished live session in the same shape as /transcribe."""
+    body_fields = await transcript_store.save_body(transcript_id, text)
+    await db.transcriptions().insert_one({
+        "transcript_id": transcript_id,
+        "filename": filename,
+        "summary": SUMMARY_NOT_AVAILABLE,
+        "user_id": user_id,
+        **body_fields,
+        "created_at": datetime.now(timezone.utc),
+    })
+    await try_index_transcript(transcript_id, user_id, text)
+
+
+# ✅ WebSocket Endpoint: Live transcription
+@router.websocket("/transcribe/live")
+async def transcribe_live(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    filename: str = "live-recording",
+    encoding: Optional[str] = None,
+    sample_rate: Optional[int] = None,
+    channels: Optional[int] = None,
+):
+    """Stream audio in, get transcript segments back as they are recognised.
+
+    Send audio as binary messages (containerised audio, or raw PCM with
+    ``encoding``/``sample_rate``/``channels``) and ``{"type": "CloseStream"}``
+    when done. The server sends ``interim`` and ``final`` segments, then
+    ``done`` with the stored ``transcript_id``.
+    """
+    current_user = await authenticate_websocket(websocket, token)
+    if current_user is None:
+        await websocket.close(code=POLICY_VIOLATION, reason="Invalid token or token expired")
+        return
+
+    controller = admission_controllers["transcribe"]
+    try:
+        ticket = await controller.acquire(current_user["username"])
+    except HTTPException as e:
+        await websocket.close(code=TRY_AGAIN_LATER, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    session = LiveSession(websocket)
+    try:
+        options = live_options(encoding=encoding, sample_rate=sample_rate, channels=channels)
+        async with connect_live(options) as upstream:
+            await session.run(upstream)
+
+    except Exception as e:
+        print(f"Live transcription error: {str(e)}")
+        if not session.client_gone:
+            await session.websocket.send_json({"type": "error", "detail": f"Error during live transcription: {str(e)}"})
+
+    finally:
+        try:
+            # ✅ Whatever was recognised is stored, even if the client dropped
+            transcript_id = None
+            if session.transcript.strip():
+                transcript_id = str(uuid.uuid4())
+                await save_live_transcript(transcript_id, current_user["username"], filename, session.transcript)
+
+            if not session.client_gone:
+                await websocket.send_json({
+                    "type": "done",
+                    "transcript_id": transcript_id,
+                    "transcript": session.transcript,
+                    "audio_bytes": session.audio_bytes,
+                    "dropped_interim": session.dropped_interim,
+                })
+                await websocket.close()
+        finally:
+            await controller.release(ticket)
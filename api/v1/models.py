@@ -1,10 +1,5 @@
-import os
-from pymongo import MongoClient
 from bson import ObjectId
-
-MONGO_URI = os.getenv('MONGODB_URI')
-client = MongoClient(MONGO_URI)
-db = client["llm_chatbot"]
+from utils import db, transcript_store
 
 class Transcription:
     def __init__(self, filename, transcript, transcript_id,summary):
@@ -18,13 +13,15 @@ class Transcription:
             "filename": self.filename,
             "transcript": self.transcript,
             "transcript_id": self.transcript_id,
-            "summary": self.summary 
+            "summary": self.summary
         }
 
-def save_transcription(transcription):
-    transcription_collection = db["transcriptions"]
-    return transcription_collection.insert_one(transcription.to_dict()).inserted_id
+async def save_transcription(transcription):
+    entry = transcription.to_dict()
+    entry.update(await transcript_store.save_body(transcription.transcript_id, entry.pop("transcript")))
+    result = await db.transcriptions().insert_one(entry)
+    return result.inserted_id
 
-def get_transcription(transcript_id):
-    transcription_collection = db["transcriptions"]
-    return transcription_collection.find_one({"_id": ObjectId(transcript_id)})
+async def get_transcription(transcript_id):
+    entry = await db.transcriptions().find_one({"_id": ObjectId(transcript_id)})
+    return await transcript_store.attach_text(entry)
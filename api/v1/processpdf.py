@@ -1,96 +1,199 @@
 import os
-import aiofiles # type: ignore
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Tuple
 from fastapi import APIRouter, Depends, UploadFile, HTTPException
-from pymongo import MongoClient
-from dotenv import load_dotenv
-from api.v1.auth import get_current_user
-from deepgram import DeepgramClient, PrerecordedOptions, FileSource # type: ignore
-from PyPDF2 import PdfReader # type: ignore
-import certifi
+from fastapi.responses import JSONResponse
+from api.v1.auth import admission, batch_admission, get_current_user
+from utils import jobs, transcript_store
+from utils.asr import DEEPGRAM_TIMEOUT_SECONDS
+from utils.services import registry
+from utils.pdf import ExtractedPdf, extract_pdf
+from utils.retrieval import index_transcript, try_index_transcript
+from utils.batching import error_status, map_bounded
+from utils.uploads import spool_batch, spool_upload, remove_quietly
 import uuid
 
-load_dotenv()
-
-# ✅ MongoDB setup
-MONGO_URL = os.getenv("MONGODB_URI")
-client = MongoClient(MONGO_URL, tlsCAFile=certifi.where())
-db = client["llm_chatbot"]
-transcription_collection = db["transcriptions"]
-
 router = APIRouter()
 
-# ✅ Deepgram API Setup
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)  # Correct for Deepgram v3
+# PDFs of one /process-pdf/batch request extracted at the same time (each one already uses the whole pool)
+PDF_BATCH_CONCURRENCY = int(os.getenv("PDF_BATCH_CONCURRENCY", "2"))
 
 # ✅ API Endpoint: Process PDF and Store in DB
 @router.post("/process-pdf")
-async def process_pdf(file: UploadFile, current_user: dict = Depends(get_current_user)):
+async def process_pdf(file: UploadFile, async_job: bool = False, current_user: dict = Depends(get_current_user), admission_ticket=Depends(admission("pdf"))):
+    file_path = None
     try:
-        # ✅ Create temp directory if not exists
-        os.makedirs("temp", exist_ok=True)
-
-        # ✅ Save PDF file temporarily
-        file_path = f"temp/{file.filename}"
-        async with aiofiles.open(file_path, "wb") as buffer:
-            await buffer.write(await file.read())
-
-        # ✅ Read and extract text from PDF
-        pdf_text = extract_text_from_pdf(file_path)
-
-        # ✅ Check if PDF text is extracted properly
-        if not pdf_text.strip():
-            raise HTTPException(status_code=400, detail="No text found in PDF")
-
-        # ✅ Generate a unique transcript ID for PDF content
-        transcript_id = str(uuid.uuid4())
+        # ✅ Stream the PDF file to a uniquely named temp file in bounded memory
+        file_path = await spool_upload(file)
 
-        # ✅ Use Deepgram to summarize the extracted text
-        # summary_data = generate_summary_with_deepgram(pdf_text)
-
-        # ✅ Save PDF data and summary to MongoDB
-        pdf_entry = {
-            "transcript_id": transcript_id,
+        payload = {
+            "file_path": file_path,
             "filename": file.filename,
-            "transcript": pdf_text,
-            # "summary": summary_data,
-            "user_id": current_user["username"]
-        }
-        transcription_collection.insert_one(pdf_entry)
-
-        # ✅ Return success response
-        return {
-            "transcript_id": transcript_id,
-            "message": "PDF processing successful",
-            "transcript": pdf_text,
-            # "summary": summary_data
+            "user_id": current_user["username"],
+            # ✅ Fixed up front so a retried job stores under the same id
+            "transcript_id": str(uuid.uuid4()),
         }
 
+        # ✅ Async mode: hand the spooled file to the job queue and return immediately
+        if async_job:
+            job_id = await jobs.submit("pdf", current_user["username"], payload)
+            file_path = None  # The job owns the file now
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+        return await run_pdf_processing(payload)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during PDF processing: {str(e)}")
 
     finally:
         # ✅ Remove the temp file after processing
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        remove_quietly(file_path)
+
 
+# ✅ API Endpoint: Process many PDFs in one request
+@router.post("/process-pdf/batch")
+async def process_pdf_batch(files: List[UploadFile], async_job: bool = False, current_user: dict = Depends(get_current_user), admission_ticket=Depends(batch_admission("pdf", PDF_BATCH_CONCURRENCY))):
+    """Extract up to MAX_BATCH_FILES PDFs concurrently; returns a status per file, in upload order.
 
-# ✅ Helper Function: Extract Text from PDF
-def extract_text_from_pdf(pdf_path: str) -> str:
+    A file that fails (too large, no text, malformed) is reported in its entry
+    without failing the rest. ``async_job=true`` queues the whole batch as one job instead.
+    """
+    payloads = []
     try:
-        # Open and read the PDF
-        pdf_reader = PdfReader(pdf_path)
-        text_content = ""
-        for page in pdf_reader.pages:
-            text_content += page.extract_text()
-        return text_content
+        payloads = await spool_batch(files, current_user["username"])
+
+        if async_job:
+            job_id = await jobs.submit("pdf_batch", current_user["username"], {"files": payloads})
+            payloads = []  # The job owns the files now
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "files": len(files)})
+
+        return await run_pdf_batch({"files": payloads})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during batch PDF processing: {str(e)}")
+
+    finally:
+        for payload in payloads:
+            remove_quietly(payload.get("file_path"))
+
+
+async def build_pdf_entry(payload: dict) -> Tuple[dict, ExtractedPdf]:
+    """Extract a spooled PDF and store its text; returns the metadata entry (not yet inserted)."""
+    # ✅ Read and extract text from PDF
+    extracted = await extract_text_from_pdf(payload["file_path"])
+    pdf_text = extracted.text
+
+    # ✅ Check if PDF text is extracted properly
+    if not pdf_text.strip():
+        raise HTTPException(status_code=400, detail="No text found in PDF")
+
+    # ✅ The transcript ID for the PDF content was allocated with the payload
+    transcript_id = payload["transcript_id"]
+
+    # ✅ Use Deepgram to summarize the extracted text
+    # summary_data = await generate_summary_with_deepgram(pdf_text)
+
+    # ✅ Save the compressed text, then PDF metadata and summary, to MongoDB
+    body_fields = await transcript_store.save_body(transcript_id, pdf_text)
+    pdf_entry = {
+        "transcript_id": transcript_id,
+        "filename": payload["filename"],
+        "page_offsets": extracted.page_offsets,
+        # "summary": summary_data,
+        "user_id": payload["user_id"],
+        **body_fields,
+        "created_at": datetime.now(timezone.utc),
+    }
+    return pdf_entry, extracted
+
+
+async def run_pdf_processing(payload: dict) -> dict:
+    """Extract and store a spooled PDF; shared by the endpoint and the job worker."""
+    pdf_entry, extracted = await build_pdf_entry(payload)
+    transcript_id = pdf_entry["transcript_id"]
+    pdf_text = extracted.text
+    await transcript_store.save_metadata([pdf_entry])
+
+    # ✅ Build the retrieval index once so /chat only sends relevant chunks
+    await try_index_transcript(transcript_id, payload["user_id"], pdf_text, extracted.page_offsets)
+
+    # ✅ Return success response
+    return {
+        "transcript_id": transcript_id,
+        "message": "PDF processing successful",
+        "transcript": pdf_text,
+        # "summary": summary_data
+    }
+
+
+async def run_pdf_batch(payload: dict) -> dict:
+    """Extract every PDF of a batch concurrently and store them with one insert_many."""
+    items = payload["files"]
+    pending = [item for item in items if "error" not in item]
+    outcomes = await map_bounded(build_pdf_entry, pending, PDF_BATCH_CONCURRENCY)
+    built = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+
+    # ✅ One round trip for all the metadata documents
+    if built:
+        await transcript_store.save_metadata([entry for entry, _ in built])
+
+    # A failed index is rebuilt by /chat on first use, so it doesn't fail the file
+    await map_bounded(
+        lambda pair: index_transcript(
+            pair[0]["transcript_id"], pair[0]["user_id"], pair[1].text, pair[1].page_offsets
+        ),
+        built,
+        PDF_BATCH_CONCURRENCY,
+    )
+
+    outcome_of = dict(zip(map(id, pending), outcomes))
+    results = []
+    for item in items:
+        outcome = item["error"] if "error" in item else outcome_of[id(item)]
+        if isinstance(outcome, BaseException):
+            outcome = error_status(outcome)
+        if isinstance(outcome, dict):
+            results.append({"filename": item["filename"], **outcome})
+            continue
+
+        entry, extracted = outcome
+        results.append({
+            "filename": item["filename"],
+            "status": "ok",
+            "transcript_id": entry["transcript_id"],
+            "pages": extracted.page_count,
+            "transcript_length": entry["transcript_length"],
+        })
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+jobs.register_handler("pdf", run_pdf_processing)
+jobs.register_handler("pdf_batch", run_pdf_batch)
+
+
+# ✅ Helper Function: Extract Text from PDF (page-parallel, off the event loop)
+async def extract_text_from_pdf(pdf_path: str) -> ExtractedPdf:
+    try:
+        return await extract_pdf(pdf_path)
     except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
+        # Malformed PDFs fail the same way on every attempt, so don't retry them
+        raise ValueError(f"Error extracting text from PDF: {str(e)}")
 
 
 # ✅ Helper Function: Generate Summary with Deepgram
-def generate_summary_with_deepgram(text: str) -> str:
+async def generate_summary_with_deepgram(text: str) -> str:
+    from deepgram import PrerecordedOptions, FileSource # type: ignore
+
     try:
+        deepgram = registry.get("deepgram")
+
         # ✅ Create payload for Deepgram summarization
         payload: FileSource = {"buffer": text.encode("utf-8")}
 
@@ -102,8 +205,11 @@ def generate_summary_with_deepgram(text: str) -> str:
             summarize="v2"  # ✅ Request summarization from Deepgram
         )
 
-        # ✅ Call Deepgram API to summarize the text
-        summary_response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options, timeout=300)
+        # ✅ Call Deepgram API (async client) to summarize the text
+        summary_response = await asyncio.wait_for(
+            deepgram.listen.asyncrest.v("1").transcribe_file(payload, options, timeout=DEEPGRAM_TIMEOUT_SECONDS),
+            timeout=DEEPGRAM_TIMEOUT_SECONDS,
+        )
 
         # ✅ Extract summary if available
         summary_data = (
@@ -43,115 +43,198 @@
 
 
 import os
-import aiofiles
-from fastapi import APIRouter, Depends, UploadFile, HTTPException
-from pymongo import MongoClient
-from dotenv import load_dotenv
-from api.v1.auth import get_current_user
-from deepgram import DeepgramClient, PrerecordedOptions, FileSource
-import certifi
+import hashlib
+from datetime import datetime, timezone
+from typing import List, Tuple
+from fastapi import APIRouter, Depends, Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+from api.v1.auth import admission, batch_admission, get_current_user
+from utils import jobs, transcript_store
+from utils.asr import TranscriptionResult, transcription_options, result_cache_key, transcribe_path, get_cached_result, store_cached_result
+from utils.batching import error_status, map_bounded
+from utils.disconnect import cancel_on_disconnect
+from utils.long_media import transcribe_long_media
+from utils.retrieval import index_transcript, try_index_transcript
+from utils.services import provide
+from utils.uploads import spool_batch, spool_upload, remove_quietly
 import uuid
 
-load_dotenv()
-
-# ✅ MongoDB setup
-MONGO_URL = os.getenv("MONGODB_URI")
-client = MongoClient(MONGO_URL, tlsCAFile=certifi.where())
-db = client["llm_chatbot"]
-transcription_collection = db["transcriptions"]
-
 router = APIRouter()
 
-# ✅ Deepgram API Setup
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)  # Correct initialization ✅
+# Files of one /transcribe/batch request sent to Deepgram at the same time
+TRANSCRIBE_BATCH_CONCURRENCY = int(os.getenv("TRANSCRIBE_BATCH_CONCURRENCY", "4"))
 
 # ✅ API Endpoint: Transcribe and store in DB
 @router.post("/transcribe")
-async def transcribe_audio(file: UploadFile, current_user: dict = Depends(get_current_user)):
+async def transcribe_audio(request: Request, file: UploadFile, async_job: bool = False, long_media: bool = False, current_user: dict = Depends(get_current_user), admission_ticket=Depends(admission("transcribe")), deepgram=Depends(provide("deepgram"))):
+    file_path = None
     try:
-        # ✅ Create temp directory if not exists
-        os.makedirs("temp", exist_ok=True)
+        # ✅ Stream the audio file to a uniquely named temp file in bounded memory,
+        # hashing it on the way so identical re-uploads can be served from cache
+        content_hash = hashlib.sha256()
+        file_path = await spool_upload(file, hasher=content_hash)
 
-        # ✅ Save audio file temporarily
-        file_path = f"temp/{file.filename}"
-        async with aiofiles.open(file_path, "wb") as buffer:
-            await buffer.write(await file.read())
+        payload = {
+            "file_path": file_path,
+            "filename": file.filename,
+            "content_sha256": content_hash.hexdigest(),
+            "user_id": current_user["username"],
+            # ✅ Fixed up front so a retried job stores under the same id
+            "transcript_id": str(uuid.uuid4()),
+            # ✅ Long recordings: transcribe silence-cut segments in parallel
+            "long_media": long_media,
+        }
 
-        # ✅ Read audio file correctly using synchronous open()
-        with open(file_path, "rb") as audio:
-            # ✅ Create the payload for transcription
-            payload: FileSource = {"buffer": audio}
+        # ✅ Async mode: hand the spooled file to the job queue and return immediately
+        if async_job:
+            job_id = await jobs.submit("transcription", current_user["username"], payload)
+            file_path = None  # The job owns the file now
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
 
-            # ✅ Set transcription options
-            options = PrerecordedOptions(
-                smart_format=True,
-                model="nova-2",  # Use latest Deepgram model
-                language="en-US"  # Set language to US English
-            )
+        # ✅ Stop paying for the transcription if the caller hangs up
+        return await cancel_on_disconnect(request, run_transcription(payload, deepgram))
 
-            print("Requesting transcript...")
-            print("Your file may take up to a couple of minutes to process...")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during transcription: {str(e)}")
 
-            # ✅ For larger files, increase timeout to 300 seconds (5 mins)
-            response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options, timeout=300)
+    finally:
+        # ✅ Clean up the temporary file after processing
+        remove_quietly(file_path)
 
-            # ✅ Print response (optional for debugging)
-            # print(response.to_json(indent=4))
 
-        # ✅ Check if transcription is successful
-        if "results" not in response.to_dict() or "channels" not in response.to_dict()["results"]:
-            raise HTTPException(status_code=500, detail="Invalid Deepgram response")
+# ✅ API Endpoint: Transcribe many files in one request
+@router.post("/transcribe/batch")
+async def transcribe_batch(request: Request, files: List[UploadFile], async_job: bool = False, current_user: dict = Depends(get_current_user), admission_ticket=Depends(batch_admission("transcribe", TRANSCRIBE_BATCH_CONCURRENCY)), deepgram=Depends(provide("deepgram"))):
+    """Transcribe up to MAX_BATCH_FILES files concurrently; returns a status per file, in upload order.
 
-        # ✅ Extract transcription text
-        transcript_data = response.to_dict()["results"]["channels"][0]["alternatives"][0]["transcript"]
+    A file that fails (too large, rejected by Deepgram...) is reported in its
+    entry without failing the rest. ``async_job=true`` queues the whole batch
+    as one job instead.
+    """
+    payloads = []
+    try:
+        payloads = await spool_batch(files, current_user["username"], hash_content=True)
 
-        # ✅ Generate a unique transcript ID
-        transcript_id = str(uuid.uuid4())
+        if async_job:
+            job_id = await jobs.submit("transcription_batch", current_user["username"], {"files": payloads})
+            payloads = []  # The job owns the files now
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "files": len(files)})
 
-        # ✅ Generate summary if requested
-        summary_data = "Summary not available"
-        try:
-            # ✅ Use same payload and options for summary
-            summary_options = PrerecordedOptions(
-                smart_format=True,
-                model="nova-2",
-                language="en-US",
-                summarize="v2"  # ✅ Generate summary
-            )
-            summary_response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, summary_options, timeout=300)
-
-            # ✅ Check if summary is available
-            if "results" in summary_response.to_dict() and "channels" in summary_response.to_dict()["results"]:
-                summary_data = summary_response.to_dict()["results"]["channels"][0]["alternatives"][0].get("summary", "Summary not available")
-
-        except Exception as summary_error:
-            print(f"Summary generation error: {str(summary_error)}")
-            summary_data = "Summary not available"
-
-        # ✅ Save transcription and summary to MongoDB
-        # print(current_user)
-        transcription_entry = {
-            "transcript_id": transcript_id,
-            "filename": file.filename,
-            "transcript": transcript_data,
-            "summary": summary_data,
-            "user_id": current_user["username"]
-        }
-        transcription_collection.insert_one(transcription_entry)
-
-        # ✅ Return success response
-        return {
-            "transcript_id": transcript_id,
-            "message": "Transcription successful",
-            "transcript": transcript_data,
-            "summary": summary_data
-        }
+        return await cancel_on_disconnect(request, run_transcription_batch({"files": payloads}, deepgram))
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during transcription: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error during batch transcription: {str(e)}")
 
     finally:
-        # ✅ Clean up the temporary file after processing
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        for payload in payloads:
+            remove_quietly(payload.get("file_path"))
+
+
+async def build_transcription(payload: dict, deepgram=None) -> Tuple[dict, TranscriptionResult]:
+    """Transcribe a spooled upload and store its body; returns the metadata entry (not yet inserted)."""
+    # ✅ One Deepgram request returns both transcript and summary
+    options = transcription_options()
+    # Segmented results are stitched, so they are cached apart from single-request ones
+    long_media = payload.get("long_media", False)
+    content_key = payload["content_sha256"] + (":segmented" if long_media else "")
+    cache_key = result_cache_key(content_key, options)
+
+    result = await get_cached_result(cache_key)
+    if result is None:
+        print("Requesting transcript...")
+        print("Your file may take up to a couple of minutes to process...")
+        try:
+            if long_media:
+                result = await transcribe_long_media(payload["file_path"], options, deepgram)
+            if result is None:
+                result = await transcribe_path(payload["file_path"], options, deepgram)
+        except ValueError as e:
+            # Deepgram answered, but not with a usable result: retrying won't help
+            raise jobs.PermanentError(status_code=502, detail=str(e))
+        await store_cached_result(cache_key, result)
+
+    # ✅ The transcript ID was allocated with the payload
+    transcript_id = payload["transcript_id"]
+
+    # ✅ Save the compressed body, then transcription metadata and summary, to MongoDB
+    body_fields = await transcript_store.save_body(transcript_id, result.transcript)
+    transcription_entry = {
+        "transcript_id": transcript_id,
+        "filename": payload["filename"],
+        "summary": result.summary,
+        "user_id": payload["user_id"],
+        "content_sha256": payload["content_sha256"],
+        **body_fields,
+        "created_at": datetime.now(timezone.utc),
+    }
+    return transcription_entry, result
+
+
+async def run_transcription(payload: dict, deepgram=None) -> dict:
+    """Transcribe a spooled upload and store it; shared by the endpoint and the job worker.
+
+    The job worker passes no client and gets the registry's shared one.
+    """
+    transcription_entry, result = await build_transcription(payload, deepgram)
+    transcript_id = transcription_entry["transcript_id"]
+    await transcript_store.save_metadata([transcription_entry])
+
+    # ✅ Build the retrieval index once so /chat only sends relevant chunks
+    await try_index_transcript(transcript_id, payload["user_id"], result.transcript)
+
+    # ✅ Return success response
+    return {
+        "transcript_id": transcript_id,
+        "message": "Transcription successful",
+        "transcript": result.transcript,
+        "summary": result.summary
+    }
+
+
+async def run_transcription_batch(payload: dict, deepgram=None) -> dict:
+    """Transcribe every file of a batch concurrently and store them with one insert_many."""
+    items = payload["files"]
+    pending = [item for item in items if "error" not in item]
+    outcomes = await map_bounded(lambda item: build_transcription(item, deepgram), pending, TRANSCRIBE_BATCH_CONCURRENCY)
+    built = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+
+    # ✅ One round trip for all the metadata documents
+    if built:
+        await transcript_store.save_metadata([entry for entry, _ in built])
+
+    # A failed index is rebuilt by /chat on first use, so it doesn't fail the file
+    await map_bounded(
+        lambda pair: index_transcript(pair[0]["transcript_id"], pair[0]["user_id"], pair[1].transcript),
+        built,
+        TRANSCRIBE_BATCH_CONCURRENCY,
+    )
+
+    outcome_of = dict(zip(map(id, pending), outcomes))
+    results = []
+    for item in items:
+        outcome = item["error"] if "error" in item else outcome_of[id(item)]
+        if isinstance(outcome, BaseException):
+            outcome = error_status(outcome)
+        if isinstance(outcome, dict):
+            results.append({"filename": item["filename"], **outcome})
+            continue
+
+        entry, result = outcome
+        results.append({
+            "filename": item["filename"],
+            "status": "ok",
+            "transcript_id": entry["transcript_id"],
+            "summary": result.summary,
+            "transcript_length": entry["transcript_length"],
+        })
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+jobs.register_handler("transcription", run_transcription)
+jobs.register_handler("transcription_batch", run_transcription_batch)
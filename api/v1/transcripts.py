@@ -1,33 +1,160 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import os
+import base64
+import json
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from api.v1.auth import get_current_user
-
-load_dotenv()
+from utils import db, search, transcript_store
 
 router = APIRouter()
 
-# MongoDB setup
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client["llm_chatbot"]
-transcription_collection = db["transcriptions"]
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+
+# Listing rows are metadata only; the length is computed server-side for
+# documents stored before transcript_length/created_at were recorded. Bodies
+# live in transcript_bodies and are only read for include_transcript.
+METADATA_PROJECTION = {
+    "_id": 1,
+    "transcript_id": 1,
+    "filename": 1,
+    "user_id": 1,
+    "created_at": {"$ifNull": ["$created_at", {"$toDate": "$_id"}]},
+    "transcript_length": {
+        "$ifNull": ["$transcript_length", {"$strLenCP": {"$ifNull": ["$transcript", ""]}}]
+    },
+}
+
+
+def encode_cursor(last_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii"))
+    except (InvalidId, ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def listing_pipeline(user_id: str, after: Optional[ObjectId], limit: Optional[int], include_transcript: bool) -> list:
+    match = {"user_id": user_id}
+    if after is not None:
+        match["_id"] = {"$lt": after}
+
+    projection = dict(METADATA_PROJECTION)
+    if include_transcript:
+        # Inline text only exists on documents not yet migrated to transcript_bodies
+        projection.update({"transcript": 1, "summary": 1})
+
+    pipeline = [{"$match": match}, {"$sort": {"_id": -1}}]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": projection})
+    return pipeline
 
 
 @router.get("/transcripts")
-async def get_all_transcripts(current_user=Depends(get_current_user)):
+async def get_all_transcripts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_transcript: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user=Depends(get_current_user),
+):
+    """List your transcripts newest first, one page at a time.
+
+    Pass ``next_cursor`` from a response as ``cursor`` to get the following
+    page. ``format=ndjson`` streams every matching row instead, for exports.
+    """
+    user_id = current_user["username"]
+    after = decode_cursor(cursor) if cursor else None
+
     try:
-        # Fetch all transcriptions from the database
-        transcripts = transcription_collection.find({}, {"_id": 0})
-        
-        # Convert cursor to list
-        transcripts_list = list(transcripts)
+        if format == "ndjson":
+            rows = await db.transcriptions().aggregate(listing_pipeline(user_id, after, None, include_transcript))
+            return StreamingResponse(stream_ndjson(rows, include_transcript), media_type="application/x-ndjson")
+
+        # Fetch one extra row to know whether another page exists
+        rows = await db.transcriptions().aggregate(listing_pipeline(user_id, after, limit + 1, include_transcript))
+        transcripts_list = await rows.to_list(length=None)
+
+        next_cursor = None
+        if len(transcripts_list) > limit:
+            transcripts_list = transcripts_list[:limit]
+            next_cursor = encode_cursor(transcripts_list[-1]["_id"])
+
+        for row in transcripts_list:
+            del row["_id"]
+            if include_transcript:
+                await transcript_store.attach_text(row)
 
-        if not transcripts_list:
-            return {"message": "No transcripts found"}
+        if not transcripts_list and cursor is None:
+            return {"message": "No transcripts found", "transcripts": [], "next_cursor": None}
 
-        return {"transcripts": transcripts_list}
+        return {"transcripts": transcripts_list, "next_cursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching transcripts: {str(e)}")
+
+
+async def stream_ndjson(rows, include_transcript: bool = False):
+    async for row in rows:
+        del row["_id"]
+        if include_transcript:
+            # One body at a time, so an export never holds more than one transcript's text
+            await transcript_store.attach_text(row)
+        yield json.dumps(jsonable_encoder(row)) + "\n"
+
+
+# Declared before /transcripts/{transcript_id} so "search" isn't taken for an id
+@router.get("/transcripts/search")
+async def search_transcripts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user=Depends(get_current_user),
+):
+    """Find which of your transcripts mention ``q``, best matches first.
+
+    Words are matched stemmed and case-insensitively, "quoted phrases" exactly
+    and ``-word`` excludes. Each hit has a snippet around the first match, its
+    character ``offset`` in the transcript and, for PDFs, its ``page``. Pass
+    ``next_offset`` as ``offset`` for the next page.
+
+    Transcripts are searchable once chunked: at upload, or for ones stored
+    before chunking existed, when first opened in /chat or after
+    ``python -m scripts.backfill_transcript_chunks`` has run.
+    """
+    try:
+        return await search.search(current_user["username"], q, limit, offset)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching transcripts: {str(e)}")
+
+
+@router.get("/transcripts/{transcript_id}")
+async def get_transcript(transcript_id: str, current_user=Depends(get_current_user)):
+    """Full transcript body and summary for a single transcript."""
+    try:
+        transcript = await db.transcriptions().find_one(
+            {"transcript_id": transcript_id, "user_id": current_user["username"]},
+            {"_id": 0, "body_chunks": 0, "body_bytes": 0}
+        )
+        await transcript_store.attach_text(transcript)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching transcript: {str(e)}")
+
+    if not transcript:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+
+    return transcript
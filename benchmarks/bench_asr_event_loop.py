@@ -0,0 +1,114 @@
+"""Health-check latency while many transcriptions are in flight.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_asr_event_loop --transcriptions 20 --asr-latency 5
+
+A fake Deepgram endpoint holds every /transcribe for ``--asr-latency`` seconds.
+While they are pending the script polls ``GET /`` and reports its latency; with
+a non-blocking ASR path it stays in the low milliseconds instead of queueing
+behind the transcriptions.
+
+Exits non-zero when any transcription fails or the health-check p99 exceeds
+``--max-health-p99-ms``, so it can gate a change.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.common import admission_overrides, percentile, seed_mongo, serve_app, start_fake_deepgram
+
+
+async def transcribe(session: aiohttp.ClientSession, base_url: str, token: str) -> int:
+    form = aiohttp.FormData()
+    # Random bytes so the content-hash cache never short-circuits the call
+    form.add_field("file", os.urandom(256 * 1024), filename="clip.wav", content_type="audio/wav")
+    async with session.post(f"{base_url}/api/v1/transcribe", data=form,
+                            headers={"Authorization": f"Bearer {token}"}) as response:
+        await response.read()
+        return response.status
+
+
+async def poll_health(session: aiohttp.ClientSession, base_url: str, until: asyncio.Task) -> list:
+    latencies = []
+    while not until.done():
+        started = time.perf_counter()
+        async with session.get(f"{base_url}/") as response:
+            await response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def run(args: argparse.Namespace, base_url: str, token: str) -> dict:
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        started = time.perf_counter()
+        uploads = asyncio.ensure_future(asyncio.gather(
+            *(transcribe(session, base_url, token) for _ in range(args.transcriptions))
+        ))
+        latencies = await poll_health(session, base_url, uploads)
+        statuses = await uploads
+        elapsed = time.perf_counter() - started
+
+    return {
+        "transcriptions": args.transcriptions,
+        "asr_latency_s": args.asr_latency,
+        "transcribe_statuses": {str(s): statuses.count(s) for s in set(statuses)},
+        "wall_seconds": round(elapsed, 2),
+        "health_samples": len(latencies),
+        "health_p50_ms": round(percentile(latencies, 50), 2),
+        "health_p99_ms": round(percentile(latencies, 99), 2),
+        "health_max_ms": round(max(latencies, default=0.0), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--transcriptions", type=int, default=20)
+    parser.add_argument("--asr-latency", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--deepgram-port", type=int, default=8769)
+    parser.add_argument("--max-health-p99-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+
+    async def with_fake_deepgram():
+        runner = await start_fake_deepgram(args.deepgram_port, latency=args.asr_latency)
+        try:
+            env = {
+                "MONGODB_URI": args.mongodb_uri,
+                "DEEPGRAM_URL": f"http://127.0.0.1:{args.deepgram_port}",
+                "DEEPGRAM_API_KEY": "fake",
+                # All transcriptions must be in flight at once, from the one seeded user
+                **admission_overrides(args.transcriptions, kinds=("transcribe",)),
+            }
+            with serve_app(args.port, env) as server:
+                return await run(args, server.base_url, seed["token"])
+        finally:
+            await runner.cleanup()
+
+    result = asyncio.run(with_fake_deepgram())
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result["transcribe_statuses"] != {"200": args.transcriptions}:
+        failures.append(f"not every transcription succeeded: {result['transcribe_statuses']}")
+    if not result["health_samples"]:
+        failures.append("no health checks completed while transcriptions were in flight")
+    elif result["health_p99_ms"] > args.max_health_p99_ms:
+        failures.append(f"health-check p99 {result['health_p99_ms']} ms is over {args.max_health_p99_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
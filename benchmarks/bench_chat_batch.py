@@ -0,0 +1,118 @@
+"""A five-question "meeting report": five parallel /chat calls vs one /chat/batch.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_chat_batch --reports 50 --hf-latency 0.5
+
+Each report asks REPORT_QUESTIONS about the seeded transcript. Every report
+uses fresh question wording, so the answer cache never answers. Reports run
+``--concurrency`` at a time; the fake inference endpoint answers in
+``--hf-latency`` seconds.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+
+from benchmarks.common import percentile, seed_mongo, serve_app, start_fake_hf
+
+REPORT_QUESTIONS = [
+    "What decisions were made?",
+    "Who owns the next steps?",
+    "What deadlines were mentioned?",
+    "What risks were raised?",
+    "What is the budget?",
+]
+
+
+async def report_with_chat(session: aiohttp.ClientSession, base_url: str, transcript_id: str, tag: int) -> int:
+    async def ask(question: str) -> int:
+        async with session.post(f"{base_url}/api/v1/chat",
+                                json={"transcript_id": transcript_id, "question": f"{question} ({tag})"}) as response:
+            await response.read()
+            return response.status
+
+    statuses = await asyncio.gather(*(ask(question) for question in REPORT_QUESTIONS))
+    return max(statuses)
+
+
+async def report_with_batch(session: aiohttp.ClientSession, base_url: str, transcript_id: str, tag: int) -> int:
+    questions = [f"{question} ({tag})" for question in REPORT_QUESTIONS]
+    async with session.post(f"{base_url}/api/v1/chat/batch",
+                            json={"transcript_id": transcript_id, "questions": questions}) as response:
+        body = await response.json()
+        return response.status if response.status != 200 or not body["failed"] else 500
+
+
+async def measure(report, session: aiohttp.ClientSession, base_url: str, transcript_id: str,
+                  reports: int, concurrency: int, tags: itertools.count) -> dict:
+    latencies, statuses = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            status = await report(session, base_url, transcript_id, next(tags))
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(reports)))
+    elapsed = time.perf_counter() - started
+    return {
+        "reports": reports,
+        "reports_per_sec": round(reports / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "statuses": statuses,
+    }
+
+
+async def run(args: argparse.Namespace, base_url: str, seed: dict) -> dict:
+    headers = {"Authorization": f"Bearer {seed['token']}"}
+    tags = itertools.count()
+    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        chat = await measure(report_with_chat, session, base_url, seed["transcript_id"],
+                             args.reports, args.concurrency, tags)
+        batch = await measure(report_with_batch, session, base_url, seed["transcript_id"],
+                              args.reports, args.concurrency, tags)
+    return {"questions_per_report": len(REPORT_QUESTIONS), "parallel_chat": chat, "chat_batch": batch}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--hf-latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8782)
+    parser.add_argument("--hf-port", type=int, default=8783)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+
+    async def with_fake_hf():
+        runner = await start_fake_hf(args.hf_port, latency=args.hf_latency)
+        try:
+            env = {
+                "MONGODB_URI": args.mongodb_uri,
+                "HF_API_URL": f"http://127.0.0.1:{args.hf_port}/",
+                # Measure the request path, not the local model
+                "LLM_LOCAL_QA_ENABLED": "false",
+                "ADMISSION_CHAT_USER_LIMIT": str(args.concurrency * len(REPORT_QUESTIONS)),
+                "ADMISSION_CHAT_RATE_PER_MINUTE": "1000000",
+                "ADMISSION_CHAT_BURST": str(args.reports * len(REPORT_QUESTIONS) * 2),
+            }
+            with serve_app(args.port, env) as server:
+                return await run(args, server.base_url, seed)
+        finally:
+            await runner.cleanup()
+
+    print(json.dumps(asyncio.run(with_fake_hf()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""/chat tail latency with and without hedging to the local QA model.
+
+Run from the repository root with a mongod listening locally (the local model
+is downloaded on first run)::
+
+    python -m benchmarks.bench_chat_routing --requests 1000 --slow-fraction 0.05 --slow-latency 8
+
+The fake inference endpoint answers in ``--latency`` seconds, but
+``--slow-fraction`` of requests take ``--slow-latency`` and ``--failure-rate``
+return 503. The same load runs against the app with the local backend disabled
+(remote only, today's behaviour) and enabled (routed and hedged). Every question
+is unique, so the answer cache never answers.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+
+from benchmarks.common import seed_mongo, serve_app, start_fake_hf, summarize
+
+TRANSCRIPT = ("The team reviewed the roadmap. Priya owns the hiring plan and the launch date is March 14. "
+              "The marketing budget is 40,000 dollars. ") * 20
+
+
+async def drive_chat(session: aiohttp.ClientSession, base_url: str, transcript_id: str, concurrency: int,
+                     total: int, first: int = 0) -> dict:
+    latencies, statuses = [], {}
+    numbers = itertools.count(first)
+
+    async def worker():
+        while (number := next(numbers)) < first + total:
+            started = time.perf_counter()
+            question = f"Who owns the hiring plan? (#{number})"
+            async with session.post(f"{base_url}/api/v1/chat",
+                                    json={"transcript_id": transcript_id, "question": question}) as response:
+                await response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def wait_for_local_model(session: aiohttp.ClientSession, base_url: str, timeout: float) -> None:
+    """The app loads the local model in the background; routing ignores it until then."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        async with session.get(f"{base_url}/metrics") as response:
+            if "\nllm_local_model_loaded 1.0" in await response.text():
+                return
+        await asyncio.sleep(1)
+    raise RuntimeError(f"Local QA model not loaded after {timeout:g} s")
+
+
+async def route_counts(session: aiohttp.ClientSession, base_url: str) -> dict:
+    async with session.get(f"{base_url}/metrics") as response:
+        text = await response.text()
+    return {
+        line.split("{", 1)[1].split("}", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line.startswith("llm_routes_total{")
+    }
+
+
+async def run_variant(args: argparse.Namespace, seed: dict, local_enabled: bool) -> dict:
+    env = {
+        "MONGODB_URI": args.mongodb_uri,
+        "HF_API_URL": f"http://127.0.0.1:{args.hf_port}/",
+        "LLM_LOCAL_QA_ENABLED": "true" if local_enabled else "false",
+        "ADMISSION_CHAT_USER_LIMIT": str(args.concurrency),
+        "ADMISSION_CHAT_RATE_PER_MINUTE": "1000000",
+        "ADMISSION_CHAT_BURST": str(args.requests),
+    }
+    headers = {"Authorization": f"Bearer {seed['token']}"}
+    with serve_app(args.port, env, timeout=120) as server:
+        async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as session:
+            if local_enabled:
+                await wait_for_local_model(session, server.base_url, args.model_timeout)
+            # Let the router collect latency samples
+            await drive_chat(session, server.base_url, seed["transcript_id"], args.concurrency, args.warmup)
+            result = await drive_chat(session, server.base_url, seed["transcript_id"], args.concurrency,
+                                      args.requests, first=args.warmup)
+            result["routes"] = await route_counts(session, server.base_url)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--model-timeout", type=float, default=600, help="seconds to wait for the local model to load")
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=8.0)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--hf-port", type=int, default=8781)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri, TRANSCRIPT)
+
+    async def with_fake_hf():
+        runner = await start_fake_hf(args.hf_port, latency=args.latency, slow_fraction=args.slow_fraction,
+                                     slow_latency=args.slow_latency, failure_rate=args.failure_rate)
+        try:
+            return {
+                "remote_only": await run_variant(args, seed, local_enabled=False),
+                "routed": await run_variant(args, seed, local_enabled=True),
+            }
+        finally:
+            await runner.cleanup()
+
+    print(json.dumps(asyncio.run(with_fake_hf()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Requests/sec on /verify-token and /chat under concurrent load against a local mongod.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_db_throughput --mongodb-uri mongodb://localhost:27017
+
+/chat talks to a local fake inference endpoint, so the numbers measure the API and
+database path only. Run the same command on an older checkout to get "before" numbers.
+"""
+import argparse
+import asyncio
+import json
+
+import aiohttp
+
+from benchmarks.common import admission_overrides, drive, seed_mongo, serve_app, start_fake_hf
+
+
+async def run(args: argparse.Namespace, base_url: str, seed: dict) -> dict:
+    headers = {"Authorization": f"Bearer {seed['token']}"}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        verify = await drive(session, "GET", f"{base_url}/api/v1/verify-token",
+                             concurrency=args.concurrency, total=args.requests)
+        chat = await drive(session, "POST", f"{base_url}/api/v1/chat",
+                           concurrency=args.concurrency, total=args.requests,
+                           json={"transcript_id": seed["transcript_id"], "question": "What was said?"})
+    return {"verify_token": verify, "chat": chat}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hf-port", type=int, default=8766)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+
+    async def with_fake_hf():
+        runner = await start_fake_hf(args.hf_port)
+        try:
+            env = {
+                "MONGODB_URI": args.mongodb_uri,
+                "HF_API_URL": f"http://127.0.0.1:{args.hf_port}/",
+                # Every request comes from the one seeded user
+                **admission_overrides(args.concurrency, kinds=("chat",)),
+            }
+            with serve_app(args.port, env) as server:
+                return await run(args, server.base_url, seed)
+        finally:
+            await runner.cleanup()
+
+    print(json.dumps(asyncio.run(with_fake_hf()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
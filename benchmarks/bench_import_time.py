@@ -0,0 +1,75 @@
+"""Cold-start guard: time ``import main`` with ``python -X importtime`` and fail on regressions.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_import_time --max-ms 1500
+
+Exits non-zero if importing the app takes longer than ``--max-ms`` (or the
+IMPORT_TIME_BUDGET_MS environment variable), or if any module that should load
+lazily (ASR SDK, PDF parser, ML stack) is pulled in at import time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import ROOT
+
+# Top-level packages that must only be imported on first use
+LAZY_PACKAGES = ("deepgram", "PyPDF2", "torch", "transformers")
+
+
+def import_profile(module: str) -> list:
+    """(cumulative_us, self_us, name) for every module imported by ``import module``."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    total_ms = next(cumulative for cumulative, _, name in rows if name == args.module) / 1000
+    eager = sorted({name.split(".")[0] for _, _, name in rows if name.split(".")[0] in LAZY_PACKAGES})
+    top_level = [row for row in rows if "." not in row[2]]
+
+    report = {
+        "module": args.module,
+        "import_ms": round(total_ms, 1),
+        "budget_ms": args.max_ms,
+        "eagerly_imported_lazy_packages": eager,
+        "heaviest_top_level": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+            for cumulative, _, name in sorted(top_level, reverse=True)[:args.top]
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+    if total_ms > args.max_ms:
+        sys.exit(f"import {args.module} took {total_ms:.0f} ms, over the {args.max_ms:.0f} ms budget")
+    if eager:
+        sys.exit(f"import {args.module} eagerly imported: {', '.join(eager)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Result latency of /transcribe/live with many concurrent real-time streams.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_live_transcription --sessions 50 --seconds 20
+    python -m benchmarks.bench_live_transcription --sessions 50 --slow-client 0.5
+
+Each session streams 16 kHz 16-bit mono PCM in 100 ms frames at real-time pace
+to the app, which relays it to a fake Deepgram streaming endpoint. Latency is
+the time from sending the audio a result covers (its end timestamp) to
+receiving that result. ``--slow-client`` makes clients pause between reads, to
+show interim results being dropped while finals still arrive.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import time
+
+import aiohttp
+
+from benchmarks.common import percentile, seed_mongo, serve_app, start_fake_deepgram_live
+
+BYTES_PER_SECOND = 32000
+FRAME_SECONDS = 0.1
+
+
+async def stream_session(session: aiohttp.ClientSession, base_url: str, token: str,
+                         seconds: float, slow_client: float) -> dict:
+    url = f"{base_url.replace('http', 'ws', 1)}/api/v1/transcribe/live"
+    params = {"token": token, "encoding": "linear16", "sample_rate": "16000", "channels": "1"}
+    sent_audio: list = []
+    sent_at: list = []
+    latencies = {"interim": [], "final": []}
+    frame = os.urandom(int(BYTES_PER_SECOND * FRAME_SECONDS))
+
+    async with session.ws_connect(url, params=params) as ws:
+
+        async def send_audio():
+            started = time.perf_counter()
+            for number in range(int(seconds / FRAME_SECONDS)):
+                # Real-time pacing, against the start time so delays don't accumulate
+                await asyncio.sleep(max(0.0, started + number * FRAME_SECONDS - time.perf_counter()))
+                await ws.send_bytes(frame)
+                sent_audio.append((number + 1) * FRAME_SECONDS)
+                sent_at.append(time.perf_counter())
+            await ws.send_str(json.dumps({"type": "CloseStream"}))
+            return time.perf_counter()
+
+        sender = asyncio.create_task(send_audio())
+        done = {}
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            payload = json.loads(message.data)
+            if payload["type"] in latencies:
+                end = payload["start"] + payload["duration"]
+                index = min(bisect.bisect_left(sent_audio, end - 1e-6), len(sent_at) - 1)
+                latencies[payload["type"]].append((time.perf_counter() - sent_at[index]) * 1000)
+            elif payload["type"] in ("done", "error"):
+                done = payload
+                break
+            if slow_client:
+                await asyncio.sleep(slow_client)
+        closed_at = await sender
+
+    return {
+        "latencies": latencies,
+        "finalize_ms": (time.perf_counter() - closed_at) * 1000,
+        "dropped_interim": done.get("dropped_interim", 0),
+        "stored": bool(done.get("transcript_id")),
+        "close_code": ws.close_code,
+    }
+
+
+async def run(args: argparse.Namespace, base_url: str, token: str) -> dict:
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        outcomes = await asyncio.gather(
+            *(stream_session(session, base_url, token, args.seconds, args.slow_client) for _ in range(args.sessions)),
+            return_exceptions=True,
+        )
+
+    completed = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+    interim = [ms for outcome in completed for ms in outcome["latencies"]["interim"]]
+    final = [ms for outcome in completed for ms in outcome["latencies"]["final"]]
+    finalize = [outcome["finalize_ms"] for outcome in completed]
+    return {
+        "sessions": args.sessions,
+        "audio_seconds": args.seconds,
+        "slow_client_s": args.slow_client,
+        "completed": len(completed),
+        "failed": len(outcomes) - len(completed),
+        "stored": sum(outcome["stored"] for outcome in completed),
+        "interim_results": len(interim),
+        "interim_p50_ms": round(percentile(interim, 50), 2),
+        "interim_p95_ms": round(percentile(interim, 95), 2),
+        "final_p50_ms": round(percentile(final, 50), 2),
+        "final_p95_ms": round(percentile(final, 95), 2),
+        "finalize_p95_ms": round(percentile(finalize, 95), 2),
+        "dropped_interim": sum(outcome["dropped_interim"] for outcome in completed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=20.0, help="audio streamed per session")
+    parser.add_argument("--asr-latency", type=float, default=0.05, help="fake Deepgram delay per frame")
+    parser.add_argument("--slow-client", type=float, default=0.0, help="seconds clients pause after each result")
+    parser.add_argument("--port", type=int, default=8776)
+    parser.add_argument("--deepgram-port", type=int, default=8777)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+
+    async def with_fake_deepgram():
+        runner = await start_fake_deepgram_live(args.deepgram_port, BYTES_PER_SECOND, latency=args.asr_latency)
+        try:
+            env = {
+                "MONGODB_URI": args.mongodb_uri,
+                "DEEPGRAM_URL": f"http://127.0.0.1:{args.deepgram_port}",
+                "DEEPGRAM_API_KEY": "fake",
+                # Every session holds a transcribe slot for its whole duration
+                "ADMISSION_TRANSCRIBE_GLOBAL_LIMIT": str(args.sessions),
+                "ADMISSION_TRANSCRIBE_USER_LIMIT": str(args.sessions),
+                "ADMISSION_TRANSCRIBE_BURST": str(args.sessions),
+            }
+            with serve_app(args.port, env) as server:
+                return await run(args, server.base_url, seed["token"])
+        finally:
+            await runner.cleanup()
+
+    print(json.dumps(asyncio.run(with_fake_deepgram()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Per-request overhead of a fresh aiohttp session vs the pooled keep-alive session.
+
+Run from the repository root (no database needed)::
+
+    python -m benchmarks.bench_llm_session --requests 500
+
+Both variants call a local fake inference endpoint that answers immediately,
+so the difference is connection setup. Against the real HTTPS endpoint the
+saving is larger, since every fresh session also pays DNS and TLS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from benchmarks.common import percentile, start_fake_hf
+
+
+async def fresh_session_call(url: str, payload: dict) -> None:
+    # What query_llm used to do on every chat request
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=payload) as response:
+            await response.json()
+
+
+async def measure(call, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_sec": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    url = f"http://127.0.0.1:{args.hf_port}/"
+    os.environ["HF_API_URL"] = url
+    from utils import llm  # Reads HF_API_URL at import
+
+    payload = {"inputs": "Transcript: hello\nQuestion: hi\nAnswer:", "parameters": llm.GENERATION_PARAMETERS}
+    runner = await start_fake_hf(args.hf_port)
+    try:
+        fresh = await measure(lambda: fresh_session_call(url, payload), args.requests, args.concurrency)
+        await llm.start_session()
+        pooled = await measure(lambda: llm.post_inference(payload), args.requests, args.concurrency)
+        await llm.close_session()
+    finally:
+        await runner.cleanup()
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "fresh_session": fresh,
+        "pooled_session": pooled,
+        "saved_ms_per_request": round(fresh["mean_ms"] - pooled["mean_ms"], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--hf-port", type=int, default=8770)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
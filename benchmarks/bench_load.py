@@ -0,0 +1,268 @@
+"""End-to-end load test: a weighted mix of API calls at fixed concurrency levels.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_load --concurrency 10 50 --duration 30 --output before.json
+    python -m benchmarks.bench_load --concurrency 10 50 --duration 30 --baseline before.json
+
+Deepgram and the Hugging Face inference API are replaced by local stand-ins with
+configurable latency, so runs are reproducible and cost nothing. Every scenario
+(each endpoint on its own, then the weighted mix) runs against a freshly started
+app at each concurrency level, so the reported peak RSS belongs to that scenario.
+Results are printed (and optionally written) as JSON; ``--baseline`` adds the
+relative change of throughput and p95/p99 against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.common import (
+    BENCH_PASSWORD,
+    BENCH_USERNAME,
+    ROOT,
+    admission_overrides,
+    peak_rss_mb,
+    seed_mongo,
+    serve_app,
+    start_fake_deepgram,
+    start_fake_hf,
+    summarize,
+    write_synthetic_pdf,
+)
+
+ENDPOINTS = ("login", "verify_token", "transcribe", "process_pdf", "chat", "transcripts")
+DEFAULT_MIX = "login=1,verify_token=4,transcribe=1,process_pdf=1,chat=4,transcripts=2"
+QUESTIONS = [f"What was decided about item {number}?" for number in range(20)]
+
+
+class Workload:
+    """Builds requests for each endpoint. Uploads are regenerated per call (aiohttp forms are single-use)."""
+
+    def __init__(self, base_url: str, seed: dict, pdf_bytes: bytes, audio_kb: int, rng: random.Random):
+        self.base_url = base_url
+        self.api = f"{base_url}/api/v1"
+        self.auth = {"Authorization": f"Bearer {seed['token']}"}
+        self.transcript_id = seed["transcript_id"]
+        self.pdf_bytes = pdf_bytes
+        self.audio_kb = audio_kb
+        self.rng = rng
+
+    def login(self):
+        form = {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}
+        return "POST", f"{self.api}/login", {"data": form}
+
+    def verify_token(self):
+        return "GET", f"{self.api}/verify-token", {"headers": self.auth}
+
+    def transcribe(self):
+        form = aiohttp.FormData()
+        # Random audio so the content-hash cache never short-circuits the ASR call
+        form.add_field("file", os.urandom(self.audio_kb * 1024), filename="clip.wav", content_type="audio/wav")
+        return "POST", f"{self.api}/transcribe", {"data": form, "headers": self.auth}
+
+    def process_pdf(self):
+        form = aiohttp.FormData()
+        form.add_field("file", self.pdf_bytes, filename="report.pdf", content_type="application/pdf")
+        return "POST", f"{self.api}/process-pdf", {"data": form, "headers": self.auth}
+
+    def chat(self):
+        # A fixed pool of questions gives a realistic blend of answer-cache hits and misses
+        question = self.rng.choice(QUESTIONS)
+        body = {"transcript_id": self.transcript_id, "question": question}
+        return "POST", f"{self.api}/chat", {"json": body, "headers": self.auth}
+
+    def transcripts(self):
+        return "GET", f"{self.api}/transcripts", {"params": {"limit": "50"}, "headers": self.auth}
+
+
+def parse_mix(spec: str) -> dict:
+    """``"chat=4,login=1"`` -> ``{"chat": 4.0, "login": 1.0}``."""
+    weights = {}
+    for part in filter(None, spec.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r} in --mix; choose from {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def drive_mix(session: aiohttp.ClientSession, workload: Workload, weights: dict,
+                    concurrency: int, duration: float, rng: random.Random) -> dict:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds, picking endpoints by weight."""
+    names = list(weights)
+    weight_values = list(weights.values())
+    latencies = {name: [] for name in names}
+    statuses = {name: {} for name in names}
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights=weight_values)[0]
+            method, url, kwargs = getattr(workload, name)()
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = "error"
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    per_endpoint = {name: summarize(latencies[name], statuses[name], elapsed) for name in names if latencies[name]}
+    everything = [latency for name in names for latency in latencies[name]]
+    merged: dict = {}
+    for name in names:
+        for status, count in statuses[name].items():
+            merged[status] = merged.get(status, 0) + count
+    return {"total": summarize(everything, merged, elapsed), "endpoints": per_endpoint}
+
+
+async def run_scenario(args: argparse.Namespace, seed: dict, pdf_bytes: bytes, weights: dict, concurrency: int) -> dict:
+    env = {
+        "MONGODB_URI": args.mongodb_uri,
+        "HF_API_URL": f"http://127.0.0.1:{args.hf_port}/",
+        "DEEPGRAM_URL": f"http://127.0.0.1:{args.deepgram_port}",
+        "DEEPGRAM_API_KEY": "fake",
+        # Every request comes from the one seeded user
+        **admission_overrides(concurrency),
+    }
+    rng = random.Random(args.seed)
+    with serve_app(args.port, env) as server:
+        workload = Workload(server.base_url, seed, pdf_bytes, args.audio_kb, rng)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            if args.warmup:
+                await drive_mix(session, workload, weights, concurrency, args.warmup, rng)
+            result = await drive_mix(session, workload, weights, concurrency, args.duration, rng)
+        result["peak_rss_mb"] = peak_rss_mb(server.pid)
+    return result
+
+
+def relative_change(current: float, before: float):
+    return round((current - before) / before * 100, 1) if before else None
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Percent change of throughput and tail latency per scenario/concurrency/endpoint."""
+    deltas: dict = {}
+    for scenario, levels in results["scenarios"].items():
+        for level, result in levels.items():
+            before_level = baseline.get("scenarios", {}).get(scenario, {}).get(level)
+            if not before_level:
+                continue
+            rows = {"total": (result["total"], before_level["total"])}
+            rows.update(
+                (name, (stats, before_level["endpoints"][name]))
+                for name, stats in result["endpoints"].items()
+                if name in before_level["endpoints"]
+            )
+            deltas.setdefault(scenario, {})[level] = {
+                name: {
+                    "requests_per_sec_pct": relative_change(now["requests_per_sec"], before["requests_per_sec"]),
+                    "p95_ms_pct": relative_change(now["p95_ms"], before["p95_ms"]),
+                    "p99_ms_pct": relative_change(now["p99_ms"], before["p99_ms"]),
+                }
+                for name, (now, before) in rows.items()
+            }
+    return deltas
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds measured per scenario and level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted endpoint mix, e.g. chat=4,login=1")
+    parser.add_argument("--scenarios", nargs="+", default=["each", "mix"], choices=["each", "mix"],
+                        help="'each' runs every endpoint of the mix on its own, 'mix' runs the weighted blend")
+    parser.add_argument("--asr-latency", type=float, default=0.5)
+    parser.add_argument("--hf-latency", type=float, default=0.2)
+    parser.add_argument("--audio-kb", type=int, default=256)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8775)
+    parser.add_argument("--hf-port", type=int, default=8776)
+    parser.add_argument("--deepgram-port", type=int, default=8777)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    seed = seed_mongo(args.mongodb_uri)
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, "report.pdf")
+        write_synthetic_pdf(pdf_path, args.pdf_pages)
+        with open(pdf_path, "rb") as handle:
+            pdf_bytes = handle.read()
+
+    scenarios = {}
+    if "each" in args.scenarios:
+        scenarios.update((name, {name: 1.0}) for name in weights)
+    if "mix" in args.scenarios:
+        scenarios["mix"] = weights
+
+    async def with_fakes():
+        hf = await start_fake_hf(args.hf_port, latency=args.hf_latency)
+        deepgram = await start_fake_deepgram(args.deepgram_port, latency=args.asr_latency)
+        try:
+            results: dict = {}
+            for scenario, scenario_weights in scenarios.items():
+                for concurrency in args.concurrency:
+                    results.setdefault(scenario, {})[str(concurrency)] = await run_scenario(
+                        args, seed, pdf_bytes, scenario_weights, concurrency
+                    )
+            return results
+        finally:
+            await deepgram.cleanup()
+            await hf.cleanup()
+
+    report = {
+        "revision": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": weights,
+            "asr_latency_s": args.asr_latency,
+            "hf_latency_s": args.hf_latency,
+            "audio_kb": args.audio_kb,
+            "pdf_pages": args.pdf_pages,
+            "seed": args.seed,
+        },
+        "scenarios": asyncio.run(with_fakes()),
+    }
+    if args.baseline:
+        with open(args.baseline) as handle:
+            report["change_vs_baseline"] = compare(report, json.load(handle))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
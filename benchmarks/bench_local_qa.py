@@ -0,0 +1,94 @@
+"""Local QA model: load time, RSS and answers/sec for fp32 vs int8 dynamic quantization.
+
+Run from the repository root (downloads the model on first run)::
+
+    python -m benchmarks.bench_local_qa --questions 64
+
+Each variant runs in its own subprocess so load time and RSS are measured
+from a clean interpreter.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import ROOT, current_rss_mb, peak_rss_mb
+
+# Fixed benchmark set: a long meeting-style context and questions with known answers
+FACTS = [
+    ("Who owns the hiring plan?", "Priya owns the hiring plan"),
+    ("When is the launch date?", "the launch date is March 14"),
+    ("What is the marketing budget?", "the marketing budget is 40,000 dollars"),
+    ("Which database are we migrating to?", "we are migrating to PostgreSQL"),
+    ("Who will write the release notes?", "Omar will write the release notes"),
+    ("What city is the offsite in?", "the offsite is in Lisbon"),
+    ("How many engineers are we hiring?", "we are hiring six engineers"),
+    ("What was the churn rate last quarter?", "churn last quarter was 3.2 percent"),
+]
+FILLER = "The team reviewed the agenda, discussed open questions and agreed to follow up next week. "
+
+
+def build_context() -> str:
+    parts = []
+    for _, fact in FACTS:
+        parts.append(FILLER * 25)
+        parts.append(f"During the meeting it was confirmed that {fact}. ")
+    return "".join(parts)
+
+
+def run_child(questions: int) -> dict:
+    started = time.perf_counter()
+    from utils import llm2
+    llm2.warm_up()
+    load_seconds = time.perf_counter() - started
+    rss_after_load = current_rss_mb(os.getpid())
+
+    context = build_context()
+    items = [{"question": FACTS[i % len(FACTS)][0], "context": context} for i in range(questions)]
+
+    answers = []
+    started = time.perf_counter()
+    for first in range(0, len(items), llm2.QA_MAX_BATCH_SIZE):
+        answers.extend(llm2.answer_batch(items[first:first + llm2.QA_MAX_BATCH_SIZE]))
+    elapsed = time.perf_counter() - started
+
+    correct = sum(
+        1 for i, answer in enumerate(answers)
+        if answer and answer.lower() in FACTS[i % len(FACTS)][1].lower()
+    )
+    return {
+        "quantized": llm2.QA_QUANTIZE,
+        "load_seconds": round(load_seconds, 2),
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(os.getpid()),
+        "answers_per_sec": round(questions / elapsed, 2),
+        "answers_contained_in_fact": f"{correct}/{questions}",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.questions)))
+        return
+
+    results = {}
+    for variant, quantize in (("fp32", "false"), ("int8", "true")):
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.bench_local_qa", "--child", "--questions", str(args.questions)],
+            cwd=ROOT,
+            env={**os.environ, "QA_QUANTIZE": quantize},
+        )
+        results[variant] = json.loads(output.decode().strip().splitlines()[-1])
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""End-to-end latency of one long recording: single request vs segment-parallel.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_long_media --minutes 120 --cost-per-audio-second 0.02
+    python -m benchmarks.bench_long_media --minutes 60 --failure-rate 0.1
+
+Writes a synthetic 16 kHz mono PCM WAV of speech-like bursts separated by
+pauses and uploads it to /transcribe twice: once as a single Deepgram request
+and once with ``long_media=true``. The fake Deepgram endpoint charges
+``--cost-per-audio-second`` of processing per second of audio it receives and
+fails ``--failure-rate`` of requests, which the segmented path retries.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import wave
+
+import aiohttp
+import numpy as np
+
+from benchmarks.common import seed_mongo, serve_app, start_fake_deepgram
+
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+
+def write_speech_like_wav(path: str, minutes: float, rng: np.random.Generator) -> None:
+    """Noise bursts of 2-8 s ("speech") between 0.3-1.5 s near-silent pauses."""
+    remaining = int(minutes * 60 * SAMPLE_RATE)
+    with wave.open(path, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(SAMPLE_RATE)
+        speaking = True
+        while remaining > 0:
+            seconds = rng.uniform(2, 8) if speaking else rng.uniform(0.3, 1.5)
+            frames = min(remaining, int(seconds * SAMPLE_RATE))
+            level = 3000 if speaking else 40
+            audio.writeframes(rng.normal(0, level, frames).clip(-32768, 32767).astype("<i2").tobytes())
+            remaining -= frames
+            speaking = not speaking
+
+
+async def transcribe(session: aiohttp.ClientSession, base_url: str, token: str, path: str, long_media: bool) -> dict:
+    started = time.perf_counter()
+    with open(path, "rb") as audio:
+        form = aiohttp.FormData()
+        form.add_field("file", audio, filename="meeting.wav", content_type="audio/wav")
+        async with session.post(f"{base_url}/api/v1/transcribe", data=form,
+                                params={"long_media": "true" if long_media else "false"},
+                                headers={"Authorization": f"Bearer {token}"}) as response:
+            body = await response.json(content_type=None)
+            status = response.status
+    return {
+        "status": status,
+        "seconds": round(time.perf_counter() - started, 2),
+        "transcript_words": len((body.get("transcript") or "").split()) if status == 200 else None,
+        "detail": body.get("detail") if status != 200 else None,
+    }
+
+
+async def run(args: argparse.Namespace, base_url: str, token: str, path: str) -> dict:
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        single = await transcribe(session, base_url, token, path, long_media=False)
+        segmented = await transcribe(session, base_url, token, path, long_media=True)
+
+    return {
+        "audio_minutes": args.minutes,
+        "file_mb": round(os.path.getsize(path) / 2**20, 1),
+        "cost_per_audio_second": args.cost_per_audio_second,
+        "failure_rate": args.failure_rate,
+        "segment_seconds": args.segment_seconds,
+        "concurrency": args.concurrency,
+        "single_request": single,
+        "segmented": segmented,
+        "speedup": round(single["seconds"] / segmented["seconds"], 2) if segmented["seconds"] else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--minutes", type=float, default=120.0)
+    parser.add_argument("--cost-per-audio-second", type=float, default=0.02,
+                        help="fake Deepgram processing seconds per second of audio")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--segment-seconds", type=float, default=300.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8778)
+    parser.add_argument("--deepgram-port", type=int, default=8779)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+    # A fresh random recording every run, so the result cache never answers
+    rng = np.random.default_rng()
+
+    async def with_fake_deepgram(path: str):
+        seconds_per_mb = args.cost_per_audio_second * 2**20 / BYTES_PER_SECOND
+        runner = await start_fake_deepgram(args.deepgram_port, seconds_per_mb=seconds_per_mb,
+                                           failure_rate=args.failure_rate)
+        try:
+            env = {
+                "MONGODB_URI": args.mongodb_uri,
+                "DEEPGRAM_URL": f"http://127.0.0.1:{args.deepgram_port}",
+                "DEEPGRAM_API_KEY": "fake",
+                "LONG_MEDIA_SEGMENT_SECONDS": str(args.segment_seconds),
+                "LONG_MEDIA_CONCURRENCY": str(args.concurrency),
+            }
+            with serve_app(args.port, env) as server:
+                return await run(args, server.base_url, seed["token"], path)
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "meeting.wav")
+        write_speech_like_wav(path, args.minutes, rng)
+        print(json.dumps(asyncio.run(with_fake_deepgram(path)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""PDF text extraction: the old sequential loop vs the page-parallel engine.
+
+Run from the repository root (no database needed)::
+
+    python -m benchmarks.bench_pdf_extraction --pages 50 500 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from PyPDF2 import PdfReader # type: ignore
+
+from benchmarks.common import write_synthetic_pdf
+from utils import pdf
+
+
+def extract_sequential(path: str) -> str:
+    # The pre-engine implementation, kept here as the baseline
+    text_content = ""
+    for page in PdfReader(path).pages:
+        text_content += page.extract_text()
+    return text_content
+
+
+async def extract_parallel(path: str) -> pdf.ExtractedPdf:
+    return await pdf.extract_pdf(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 500, 2000])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # Warm the process pool so its spawn cost is not charged to the first size
+        warm_path = os.path.join(workdir, "warm.pdf")
+        write_synthetic_pdf(warm_path, 1)
+        asyncio.run(extract_parallel(warm_path))
+
+        for pages in args.pages:
+            path = os.path.join(workdir, f"synthetic-{pages}.pdf")
+            write_synthetic_pdf(path, pages)
+
+            started = time.perf_counter()
+            sequential_text = extract_sequential(path)
+            sequential = time.perf_counter() - started
+
+            started = time.perf_counter()
+            extracted = asyncio.run(extract_parallel(path))
+            parallel = time.perf_counter() - started
+
+            results.append({
+                "pages": pages,
+                "file_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+                "sequential_s": round(sequential, 3),
+                "parallel_s": round(parallel, 3),
+                "speedup": round(sequential / parallel, 2) if parallel else None,
+                "pages_per_sec_parallel": round(pages / parallel, 1) if parallel else None,
+                "same_text": sequential_text == extracted.text,
+                "page_offsets_recorded": extracted.page_count,
+            })
+    pdf.shutdown()
+
+    print(json.dumps({"workers": pdf.PDF_WORKERS, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""/transcripts/search: indexing throughput and query latency at 10k and 100k transcripts.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_search --sizes 10000,100000 --words 1500 --users 10
+
+For each size a scratch database (dropped afterwards) is filled through the
+same ``index_transcript`` call ingest uses, with the search text index in
+place, and then queried as one user with rare terms, common terms, several
+terms and a phrase. Transcripts are spread evenly over ``--users`` users, so
+each query searches ``size / users`` transcripts.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from benchmarks.bench_transcript_storage import VOCABULARY, synthetic_transcript, timed
+from utils import db, search
+from utils.batching import map_bounded
+from utils.retrieval import index_transcript
+
+QUERIES = {
+    "rare_term": VOCABULARY[4000],
+    "common_term": VOCABULARY[2],
+    "three_terms": f"{VOCABULARY[40]} {VOCABULARY[400]} {VOCABULARY[1400]}",
+    "phrase": f'"{VOCABULARY[0]} {VOCABULARY[1]}"',
+}
+
+
+async def fill(size: int, args: argparse.Namespace, rng: np.random.Generator) -> dict:
+    started = time.perf_counter()
+    chunks = 0
+    for first in range(0, size, args.batch):
+        items = [(f"t{number}", f"user{number % args.users}", synthetic_transcript(args.words, rng))
+                 for number in range(first, min(size, first + args.batch))]
+        counts = await map_bounded(lambda item: index_transcript(*item), items, args.concurrency)
+        for count in counts:
+            if isinstance(count, BaseException):
+                raise count
+        chunks += sum(counts)
+    elapsed = time.perf_counter() - started
+
+    stats = await db.get_db().command("collStats", "transcript_chunks")
+    return {
+        "seconds": round(elapsed, 1),
+        "transcripts_per_sec": round(size / elapsed, 1),
+        "chunks": chunks,
+        "chunks_per_sec": round(chunks / elapsed, 1),
+        "text_index_mb": round(stats.get("indexSizes", {}).get("user_id_text", 0) / 2**20, 1),
+    }
+
+
+async def query_latency(args: argparse.Namespace) -> dict:
+    latencies = {}
+    for name, query in QUERIES.items():
+        result = await search.search("user0", query, 20, 0)
+        latencies[name] = {
+            "first_page_hits": len(result["results"]),
+            **await timed(args.samples, lambda: search.search("user0", query, 20, 0)),
+        }
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = np.random.default_rng(args.seed)
+    db.MONGODB_URI = args.mongodb_uri
+    db.MONGODB_DB_NAME = args.db_name
+    await db.connect()
+    results = {}
+    try:
+        for size in args.sizes:
+            await db.get_db().client.drop_database(db.MONGODB_DB_NAME)
+            await db.ensure_indexes()
+            indexing = await fill(size, args, rng)
+            results[str(size)] = {
+                "transcripts_per_user": size // args.users,
+                "indexing": indexing,
+                "queries": await query_latency(args),
+            }
+    finally:
+        await db.get_db().client.drop_database(db.MONGODB_DB_NAME)
+        await db.close()
+    return {"words_per_transcript": args.words, "users": args.users, "sizes": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="llm_chatbot_bench_search", help="scratch database, dropped afterwards")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[10_000, 100_000])
+    parser.add_argument("--words", type=int, default=1500, help="words per transcript (~10 min of speech)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=500, help="transcripts generated per round")
+    parser.add_argument("--concurrency", type=int, default=16, help="index_transcript calls in flight")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Inline transcript text vs metadata + compressed body store: storage and read latency.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_transcript_storage --transcripts 2000 --words 20000
+
+Seeds a scratch database (dropped afterwards) with transcripts in the old inline
+layout, measures listing and lookup reads, migrates it with the same code as
+``scripts.migrate_transcript_bodies`` and measures again.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import numpy as np
+
+from api.v1.transcripts import listing_pipeline
+from benchmarks.common import percentile
+from utils import db, transcript_store
+
+USER_ID = "bench-user"
+VOCABULARY = [f"word{number}" for number in range(5000)]
+
+
+def synthetic_transcript(words: int, rng: np.random.Generator) -> str:
+    """Zipf-distributed words, roughly as compressible as real speech transcripts."""
+    ranks = np.minimum(rng.zipf(1.2, size=words), len(VOCABULARY)) - 1
+    return " ".join(VOCABULARY[rank] for rank in ranks)
+
+
+async def timed(samples: int, call) -> dict:
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(percentile(latencies, 50), 2), "p95_ms": round(percentile(latencies, 95), 2)}
+
+
+async def collection_mb(name: str) -> float:
+    stats = await db.get_db().command("collStats", name)
+    return round(stats.get("storageSize", 0) / 2**20, 2)
+
+
+async def measure(transcript_ids: list, samples: int, rng: np.random.Generator) -> dict:
+    async def listing():
+        rows = await db.transcriptions().aggregate(listing_pipeline(USER_ID, None, 51, False))
+        await rows.to_list(length=None)
+
+    async def metadata_lookup():
+        # What /chat reads when the retrieval index is missing
+        transcript_id = transcript_ids[rng.integers(len(transcript_ids))]
+        await db.transcriptions().find_one(
+            {"transcript_id": transcript_id}, {"transcript_id": 1, "user_id": 1, "page_offsets": 1, "transcript": 1}
+        )
+
+    async def full_text():
+        transcript_id = transcript_ids[rng.integers(len(transcript_ids))]
+        entry = await db.transcriptions().find_one({"transcript_id": transcript_id})
+        await transcript_store.load_text(entry)
+
+    return {
+        "list_50": await timed(samples, listing),
+        "lookup_for_chat": await timed(samples, metadata_lookup),
+        "full_text": await timed(samples, full_text),
+        "transcriptions_mb": await collection_mb("transcriptions"),
+        "transcript_bodies_mb": await collection_mb("transcript_bodies"),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = np.random.default_rng(args.seed)
+    db.MONGODB_URI = args.mongodb_uri
+    db.MONGODB_DB_NAME = args.db_name
+    await db.connect()
+    try:
+        await db.get_db().client.drop_database(db.MONGODB_DB_NAME)
+        await db.ensure_indexes()
+
+        transcript_ids = []
+        inline_bytes = 0
+        for first in range(0, args.transcripts, 100):
+            batch = []
+            for _ in range(min(100, args.transcripts - first)):
+                text = synthetic_transcript(args.words, rng)
+                inline_bytes += len(text.encode("utf-8"))
+                transcript_ids.append(str(uuid.uuid4()))
+                batch.append({"transcript_id": transcript_ids[-1], "filename": "meeting.wav", "transcript": text,
+                              "summary": "Summary not available", "user_id": USER_ID,
+                              "transcript_length": len(text)})
+            await db.transcriptions().insert_many(batch)
+        # Reads are measured on a hot cache in both layouts
+        await measure(transcript_ids, args.samples, rng)
+        inline = await measure(transcript_ids, args.samples, rng)
+
+        started = time.perf_counter()
+        compressed_bytes = 0
+        async for entry in db.transcriptions().find({}, {"transcript_id": 1, "transcript": 1}):
+            body_fields = await transcript_store.save_body(entry["transcript_id"], entry["transcript"])
+            compressed_bytes += body_fields["body_bytes"]
+            await db.transcriptions().update_one(
+                {"_id": entry["_id"]}, {"$set": body_fields, "$unset": {"transcript": ""}}
+            )
+        migration_seconds = time.perf_counter() - started
+        await db.get_db().command("compact", "transcriptions")
+
+        await measure(transcript_ids, args.samples, rng)
+        split = await measure(transcript_ids, args.samples, rng)
+
+        return {
+            "transcripts": args.transcripts,
+            "words_per_transcript": args.words,
+            "inline_text_mb": round(inline_bytes / 2**20, 2),
+            "compressed_text_mb": round(compressed_bytes / 2**20, 2),
+            "compression_ratio": round(inline_bytes / compressed_bytes, 2) if compressed_bytes else None,
+            "migration_seconds": round(migration_seconds, 2),
+            "inline_layout": inline,
+            "split_layout": split,
+        }
+    finally:
+        await db.get_db().client.drop_database(db.MONGODB_DB_NAME)
+        await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="llm_chatbot_bench_storage", help="scratch database, dropped afterwards")
+    parser.add_argument("--transcripts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=20000, help="words per transcript (~2 h of speech)")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
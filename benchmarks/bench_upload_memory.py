@@ -0,0 +1,73 @@
+"""Peak server RSS while uploading a large synthetic file to /process-pdf.
+
+Run from the repository root with a mongod listening locally::
+
+    python -m benchmarks.bench_upload_memory --size-mb 1024
+
+The payload is not a real PDF, so the request ends in an extraction error after
+the upload has been spooled; what matters is the server's memory high-water mark,
+which should stay flat as ``--size-mb`` grows.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.common import current_rss_mb, peak_rss_mb, seed_mongo, serve_app
+
+
+def write_synthetic_file(path: str, size_mb: int) -> None:
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as out:
+        for _ in range(size_mb):
+            out.write(block)
+
+
+async def upload(base_url: str, token: str, path: str) -> dict:
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        with open(path, "rb") as payload:
+            form = aiohttp.FormData()
+            form.add_field("file", payload, filename="synthetic.pdf", content_type="application/pdf")
+            started = time.perf_counter()
+            async with session.post(f"{base_url}/api/v1/process-pdf", data=form,
+                                    headers={"Authorization": f"Bearer {token}"}) as response:
+                await response.read()
+                return {"status": response.status, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    seed = seed_mongo(args.mongodb_uri)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "synthetic.bin")
+        write_synthetic_file(path, args.size_mb)
+
+        env = {
+            "MONGODB_URI": args.mongodb_uri,
+            "MAX_UPLOAD_BYTES": str((args.size_mb + 64) * 1024 * 1024),
+            "UPLOAD_DIR": os.path.join(workdir, "spool"),
+        }
+        with serve_app(args.port, env) as server:
+            idle_rss = current_rss_mb(server.pid)
+            result = asyncio.run(upload(server.base_url, seed["token"], path))
+            result.update({
+                "size_mb": args.size_mb,
+                "idle_rss_mb": idle_rss,
+                "peak_rss_mb": peak_rss_mb(server.pid),
+            })
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
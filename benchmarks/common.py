@@ -0,0 +1,356 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks are run from the repository root, e.g. ``python -m benchmarks.bench_db_throughput``.
+They start the real app under uvicorn in a subprocess and talk to it over HTTP,
+so the numbers include the full request path (routing, auth, driver, event loop).
+"""
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USERNAME = "bench-user"
+BENCH_PASSWORD = "bench-password"
+
+
+class AppServer(NamedTuple):
+    base_url: str
+    pid: int
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def drive(session: aiohttp.ClientSession, method: str, url: str, *, concurrency: int,
+                total: int, **request_kwargs) -> dict:
+    """Fire ``total`` requests with ``concurrency`` in flight and summarise the results."""
+    latencies = []
+    statuses: dict = {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, **request_kwargs) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = "error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {"concurrency": concurrency, **summarize(latencies, statuses, elapsed)}
+
+
+def summarize(latencies: list, statuses: dict, elapsed: float) -> dict:
+    """Throughput, latency percentiles and status counts for one batch of requests."""
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+def admission_overrides(concurrency: int, kinds=("transcribe", "pdf", "chat")) -> dict:
+    """App environment letting one seeded user keep ``concurrency`` requests of each kind running.
+
+    The default per-user rate and concurrency limits would otherwise turn
+    most benchmark requests into 429s.
+    """
+    env = {}
+    for kind in kinds:
+        prefix = f"ADMISSION_{kind.upper()}_"
+        env.update({
+            prefix + "GLOBAL_LIMIT": str(concurrency),
+            prefix + "USER_LIMIT": str(concurrency),
+            prefix + "QUEUE_DEPTH": str(concurrency),
+            prefix + "RATE_PER_MINUTE": "1000000",
+            prefix + "BURST": "1000000",
+        })
+    return env
+
+
+@contextmanager
+def serve_app(port: int, env: Optional[dict] = None, timeout: float = 30.0):
+    """Run ``main:app`` under uvicorn in a subprocess and yield its URL and pid."""
+    process_env = {**os.environ, **(env or {})}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT,
+        env=process_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base_url, timeout, process)
+        yield AppServer(base_url, process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _wait_until_up(base_url: str, timeout: float, process: subprocess.Popen) -> None:
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"App did not start within {timeout}s")
+
+
+def peak_rss_mb(pid: int) -> float:
+    """High-water-mark resident set size of a process, from /proc (Linux only)."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def current_rss_mb(pid: int) -> float:
+    """Current resident set size of a process, from /proc (Linux only)."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+async def start_fake_hf(port: int, latency: float = 0.0, slow_fraction: float = 0.0, slow_latency: float = 0.0,
+                        failure_rate: float = 0.0) -> web.AppRunner:
+    """Start a stand-in for the Hugging Face inference endpoint on ``port``.
+
+    ``slow_fraction`` of requests take ``slow_latency`` instead of ``latency``
+    (a heavy tail); ``failure_rate`` of them answer 503 (a cold model).
+    """
+
+    async def generate(request: web.Request) -> web.Response:
+        payload = await request.json()
+        delay = slow_latency if slow_fraction and random.random() < slow_fraction else latency
+        if delay:
+            await asyncio.sleep(delay)
+        if failure_rate and random.random() < failure_rate:
+            return web.json_response({"error": "Model is currently loading"}, status=503)
+        return web.json_response([{"generated_text": f"{payload['inputs']} benchmark answer"}])
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/{tail:.*}", generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def fake_deepgram_response(transcript: str, summary: str = "Fake summary.") -> dict:
+    """Minimal prerecorded response in the shape the Deepgram SDK parses."""
+    return {
+        "metadata": {
+            "transaction_key": "deprecated",
+            "request_id": "00000000-0000-0000-0000-000000000000",
+            "sha256": "",
+            "created": "2025-01-01T00:00:00.000Z",
+            "duration": 1.0,
+            "channels": 1,
+            "models": ["fake"],
+            "model_info": {},
+        },
+        "results": {
+            "channels": [{"alternatives": [{"transcript": transcript, "confidence": 0.99, "words": []}]}],
+            "summary": {"result": "success", "short": summary},
+        },
+    }
+
+
+async def start_fake_deepgram(port: int, latency: float = 0.0, seconds_per_mb: float = 0.0,
+                              failure_rate: float = 0.0) -> web.AppRunner:
+    """Start a stand-in for Deepgram's prerecorded endpoint (POST /v1/listen) on ``port``.
+
+    Each request sleeps ``latency`` plus ``seconds_per_mb`` for every MB of audio
+    received, then fails with a 503 with probability ``failure_rate``.
+    """
+
+    async def listen(request: web.Request) -> web.Response:
+        received = 0
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            received += len(chunk)
+        await asyncio.sleep(latency + seconds_per_mb * received / (1024 * 1024))
+        if failure_rate and random.random() < failure_rate:
+            return web.json_response({"err_code": "OVERLOADED", "err_msg": "Injected failure"}, status=503)
+        return web.json_response(fake_deepgram_response(f"fake transcript of {received} bytes"))
+
+    app = web.Application(client_max_size=0)
+    app.router.add_post("/v1/listen", listen)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def start_fake_deepgram_live(port: int, bytes_per_second: int = 32000, words_per_final: int = 8,
+                                   latency: float = 0.0) -> web.AppRunner:
+    """Start a stand-in for Deepgram's streaming endpoint (WebSocket /v1/listen) on ``port``.
+
+    Every audio frame is answered with an interim result after ``latency``; every
+    ``words_per_final`` frames the segment is finalised. ``bytes_per_second``
+    converts received audio into result timestamps (16 kHz 16-bit mono by default).
+    On CloseStream the open segment is finalised and the socket closed.
+    """
+
+    def results(words: list, start: float, end: float, is_final: bool) -> str:
+        return json.dumps({
+            "type": "Results",
+            "start": start,
+            "duration": end - start,
+            "is_final": is_final,
+            "speech_final": is_final,
+            "channel": {"alternatives": [{"transcript": " ".join(words), "confidence": 0.99}]},
+        })
+
+    async def listen(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        received = 0
+        words: list = []
+        segment_start = 0.0
+        async for message in ws:
+            if message.type == web.WSMsgType.BINARY:
+                received += len(message.data)
+                words.append(f"word{received}")
+                await asyncio.sleep(latency)
+                now = received / bytes_per_second
+                is_final = len(words) >= words_per_final
+                await ws.send_str(results(words, segment_start, now, is_final))
+                if is_final:
+                    words, segment_start = [], now
+            elif message.type == web.WSMsgType.TEXT and json.loads(message.data).get("type") == "CloseStream":
+                if words:
+                    await ws.send_str(results(words, segment_start, received / bytes_per_second, True))
+                await ws.send_str(json.dumps({"type": "Metadata", "duration": received / bytes_per_second}))
+                break
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/v1/listen", listen)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+LINES_PER_PAGE = 45
+
+
+def write_synthetic_pdf(path: str, pages: int) -> None:
+    """Write a plain-text PDF with ``pages`` pages of Helvetica text."""
+    bodies = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    page_ids = []
+    next_id = 4
+    for number in range(pages):
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        lines = "".join(
+            f"(Page {number} line {line}: the quarterly report discusses budget, hiring and roadmap.) Tj T* "
+            for line in range(LINES_PER_PAGE)
+        )
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {lines}ET".encode("latin-1")
+        bodies[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        bodies[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode("latin-1")
+    bodies[2] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in range(1, next_id):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n" % object_id + bodies[object_id] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % next_id
+    out += b"".join(b"%010d 00000 n \n" % offsets[object_id] for object_id in range(1, next_id))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref)
+
+    with open(path, "wb") as handle:
+        handle.write(out)
+
+
+def seed_mongo(mongodb_uri: str, transcript_text: str = "benchmark transcript " * 200) -> dict:
+    """Insert a benchmark user and transcript; return a bearer token and transcript id."""
+    from bson import Binary
+    from pymongo import MongoClient
+    from utils.auth import create_access_token, get_password_hash
+    from utils.transcript_store import BODY_CODEC, compress_body
+
+    client = MongoClient(mongodb_uri)
+    try:
+        database = client[os.getenv("MONGODB_DB_NAME", "llm_chatbot")]
+        database["users"].update_one(
+            {"username": BENCH_USERNAME},
+            {"$set": {"username": BENCH_USERNAME, "email": "bench@example.com",
+                      "password": get_password_hash(BENCH_PASSWORD)}},
+            upsert=True,
+        )
+        compressed = compress_body(transcript_text)
+        database["transcript_bodies"].delete_many({"transcript_id": "bench-transcript"})
+        database["transcript_bodies"].insert_many([
+            {"transcript_id": "bench-transcript", "seq": seq, "codec": BODY_CODEC, "data": Binary(data)}
+            for seq, data in enumerate(compressed)
+        ])
+        database["transcriptions"].update_one(
+            {"transcript_id": "bench-transcript"},
+            {"$set": {"transcript_id": "bench-transcript", "filename": "bench.txt",
+                      "summary": "Summary not available", "user_id": BENCH_USERNAME,
+                      "transcript_length": len(transcript_text), "body_chunks": len(compressed),
+                      "body_bytes": sum(len(data) for data in compressed)},
+             "$unset": {"transcript": ""}},
+            upsert=True,
+        )
+    finally:
+        client.close()
+
+    return {
+        "token": create_access_token(data={"sub": BENCH_USERNAME}),
+        "transcript_id": "bench-transcript",
+    }
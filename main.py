@@ -1,4 +1,9 @@
-from fastapi import FastAPI, UploadFile, File
+import sys
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse
 from api.v1.transcribe import transcribe_audio
 from api.v1.chat import ask_question
 from api.v1.transcripts import get_all_transcripts
@@ -6,17 +11,53 @@ from api.v1 import transcribe
 from api.v1 import chat
 from api.v1 import transcripts
 from api.v1 import processpdf
+from api.v1 import jobs
+from api.v1 import live
 from api.v1.auth import router as auth_router
 from fastapi.openapi.models import APIKey
 from fastapi.openapi.models import SecurityScheme
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
+from utils import db
+from utils import jobs as job_queue
+from utils import pdf
+from utils import llm
+from utils import llm_router
+from utils import metrics
+from utils.services import registry as services
+from utils.uploads import declared_length_too_large, request_upload_limit
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MongoDB client per worker, opened and closed with the app
+    await db.connect()
+    await db.ensure_indexes()
+    await llm.start_session()
+    await job_queue.start()
+    await metrics.loop_lag_monitor.start()
+    # The local QA model loads in the background; /chat uses it once it's ready
+    local_warm_up = asyncio.create_task(llm_router.warm_up_local())
+    try:
+        yield
+    finally:
+        local_warm_up.cancel()
+        # Only if something loaded the local model: importing it here would load it just to close it
+        if "utils.llm2" in sys.modules:
+            await sys.modules["utils.llm2"].qa_batcher.close()
+        await metrics.loop_lag_monitor.stop()
+        await job_queue.stop()
+        pdf.shutdown()
+        await llm.close_session()
+        await services.close()
+        await db.close()
 
 
 app = FastAPI(
     title="LLM & ASR Chatbot API",
     description="Transcribe audio/video and chat with AI using OpenAI/LangChain",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [    
@@ -30,15 +71,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse before the multipart body is parsed and spooled to disk
+    if declared_length_too_large(request):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the maximum size of {request_upload_limit(request)} bytes"},
+        )
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Outermost middleware: latency to response headers, in-flight and status per route template
+    timings = metrics.start_request_timings()
+    metrics.http_requests_in_flight.inc(request.method)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.http_requests_in_flight.dec(request.method)
+        route = request.scope.get("route")
+        # Unmatched paths share one label so scanners can't blow up cardinality
+        route_path = route.path if route is not None else "unmatched"
+        metrics.http_request_seconds.observe(elapsed, request.method, route_path)
+        metrics.http_requests_total.inc(request.method, route_path, str(status))
+
+    if metrics.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to LLM Chatbot API!"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Transcription Endpoint
 app.include_router(auth_router, prefix="/api/v1", tags=["Auth"])
 app.include_router(transcribe.router, prefix="/api/v1", tags=["Transcription"])
 app.include_router(chat.router, prefix="/api/v1", tags=["Chat"])
 app.include_router(processpdf.router, prefix="/api/v1", tags=["PDFProcess"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
+app.include_router(live.router, prefix="/api/v1", tags=["Transcription"])
 
 # app.post("/api/v1/transcribe")(transcribe_audio)
 
@@ -0,0 +1,95 @@
+"""Build ``transcript_chunks`` for transcripts stored before retrieval indexing existed.
+
+Run from the repository root against the same MONGODB_URI as the app::
+
+    python -m scripts.backfill_transcript_chunks --dry-run
+    python -m scripts.backfill_transcript_chunks
+
+New transcripts are chunked at ingest, and older ones only when first opened
+in /chat, so until this runs /transcripts/search can't find them. Transcripts
+that already have chunks are skipped, so an interrupted run can simply be
+started again.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from utils import db, transcript_store
+from utils.batching import map_bounded
+from utils.retrieval import index_transcript
+
+
+async def backfill_one(entry: dict, dry_run: bool) -> int:
+    """Chunks written for one transcript; 0 when it was already indexed."""
+    if await db.transcript_chunks().find_one({"transcript_id": entry["transcript_id"]}, {"_id": 1}):
+        return 0
+    if dry_run:
+        return 1
+    text = await transcript_store.load_text(entry)
+    return await index_transcript(entry["transcript_id"], entry.get("user_id"), text or "", entry.get("page_offsets"))
+
+
+async def backfill(args: argparse.Namespace) -> dict:
+    await db.connect()
+    try:
+        await db.ensure_indexes()
+
+        scanned = indexed = chunks = failed = 0
+        started = time.perf_counter()
+        cursor = db.transcriptions().find(
+            {}, {"transcript_id": 1, "user_id": 1, "page_offsets": 1, "transcript": 1}, batch_size=args.batch_size
+        )
+        batch = []
+        async for entry in cursor:
+            batch.append(entry)
+            if args.limit and scanned + len(batch) >= args.limit:
+                break
+            if len(batch) < args.batch_size:
+                continue
+            counts = await map_bounded(lambda item: backfill_one(item, args.dry_run), batch, args.concurrency)
+            scanned, indexed, chunks, failed = tally(batch, counts, scanned, indexed, chunks, failed)
+            batch = []
+            print(f"... {scanned} scanned, {indexed} indexed", flush=True)
+        if batch:
+            counts = await map_bounded(lambda item: backfill_one(item, args.dry_run), batch, args.concurrency)
+            scanned, indexed, chunks, failed = tally(batch, counts, scanned, indexed, chunks, failed)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "dry_run": args.dry_run,
+            "scanned": scanned,
+            # In a dry run: transcripts that would be indexed
+            "indexed": indexed,
+            "chunks": None if args.dry_run else chunks,
+            "failed": failed,
+            "seconds": round(elapsed, 2),
+        }
+    finally:
+        await db.close()
+
+
+def tally(batch: list, counts: list, scanned: int, indexed: int, chunks: int, failed: int) -> tuple:
+    for entry, count in zip(batch, counts):
+        if isinstance(count, BaseException):
+            failed += 1
+            print(f"Indexing transcript {entry.get('transcript_id')} failed: {str(count)}", flush=True)
+        elif count:
+            indexed += 1
+            chunks += count
+    return scanned + len(batch), indexed, chunks, failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="transcripts indexed at once")
+    parser.add_argument("--limit", type=int, default=0, help="stop after scanning this many transcripts (0 = all)")
+    parser.add_argument("--dry-run", action="store_true", help="only count the transcripts that need indexing")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(backfill(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
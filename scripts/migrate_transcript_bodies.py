@@ -0,0 +1,95 @@
+"""Move inline ``transcript`` text out of ``transcriptions`` into compressed ``transcript_bodies``.
+
+Run from the repository root against the same MONGODB_URI as the app::
+
+    python -m scripts.migrate_transcript_bodies --dry-run
+    python -m scripts.migrate_transcript_bodies
+
+Each document's body is written first and the inline field removed second, so
+an interrupted run loses nothing and can simply be started again; the app reads
+both layouts in the meantime. MongoDB only returns the freed space to the OS
+after ``compact`` on the transcriptions collection.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from pymongo.errors import OperationFailure
+
+from utils import db, transcript_store
+
+
+async def collection_sizes() -> dict:
+    sizes = {}
+    for name in ("transcriptions", "transcript_bodies"):
+        try:
+            stats = await db.get_db().command("collStats", name)
+        except OperationFailure:
+            # Collection doesn't exist yet
+            stats = {}
+        sizes[name] = {"size_mb": round(stats.get("size", 0) / 2**20, 2),
+                       "storage_mb": round(stats.get("storageSize", 0) / 2**20, 2)}
+    return sizes
+
+
+async def migrate(args: argparse.Namespace) -> dict:
+    await db.connect()
+    try:
+        await db.ensure_indexes()
+        before = await collection_sizes()
+
+        migrated = 0
+        inline_bytes = 0
+        compressed_bytes = 0
+        started = time.perf_counter()
+        cursor = db.transcriptions().find(
+            {"transcript": {"$exists": True}}, {"transcript_id": 1, "transcript": 1}, batch_size=args.batch_size
+        )
+        async for entry in cursor:
+            text = entry["transcript"] or ""
+            inline_bytes += len(text.encode("utf-8"))
+            if args.dry_run:
+                compressed_bytes += sum(
+                    len(data) for data in await asyncio.to_thread(transcript_store.compress_body, text)
+                )
+            else:
+                body_fields = await transcript_store.save_body(entry["transcript_id"], text)
+                compressed_bytes += body_fields["body_bytes"]
+                await db.transcriptions().update_one(
+                    {"_id": entry["_id"]}, {"$set": body_fields, "$unset": {"transcript": ""}}
+                )
+
+            migrated += 1
+            if migrated % args.batch_size == 0:
+                print(f"... {migrated} transcripts", flush=True)
+            if args.limit and migrated >= args.limit:
+                break
+        elapsed = time.perf_counter() - started
+
+        return {
+            "dry_run": args.dry_run,
+            "transcripts": migrated,
+            "seconds": round(elapsed, 2),
+            "inline_mb": round(inline_bytes / 2**20, 2),
+            "compressed_mb": round(compressed_bytes / 2**20, 2),
+            "compression_ratio": round(inline_bytes / compressed_bytes, 2) if compressed_bytes else None,
+            "collections_before": before,
+            "collections_after": await collection_sizes(),
+        }
+    finally:
+        await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many transcripts (0 = all)")
+    parser.add_argument("--dry-run", action="store_true", help="only report the expected compression")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(migrate(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
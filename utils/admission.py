@@ -0,0 +1,275 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Optional
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+from utils import db, metrics
+from utils.cache import LRUTTLCache
+
+load_dotenv()
+
+# "local": limits are per worker process. "mongo": counters live in MongoDB and
+# hold across every worker and replica sharing the database.
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "local")
+# A slot whose holder died (crashed worker) is reclaimed after this long
+ADMISSION_LEASE_SECONDS = float(os.getenv("ADMISSION_LEASE_SECONDS", "900"))
+# How often queued requests re-check slots freed by other workers
+ADMISSION_POLL_SECONDS = float(os.getenv("ADMISSION_POLL_SECONDS", "0.25"))
+ADMISSION_BUCKET_CACHE_SIZE = 100_000
+
+
+@dataclass
+class AdmissionPolicy:
+    global_limit: int
+    user_limit: int
+    queue_depth: int
+    queue_timeout: float
+    rate_per_minute: float
+    burst: int
+
+
+def policy_from_env(kind: str, global_limit: int, user_limit: int, queue_depth: int, queue_timeout: float,
+                    rate_per_minute: float, burst: int) -> AdmissionPolicy:
+    """Defaults for ``kind``, each overridable as ADMISSION_<KIND>_<FIELD>."""
+    prefix = f"ADMISSION_{kind.upper()}_"
+    return AdmissionPolicy(
+        global_limit=int(os.getenv(prefix + "GLOBAL_LIMIT", str(global_limit))),
+        user_limit=int(os.getenv(prefix + "USER_LIMIT", str(user_limit))),
+        queue_depth=int(os.getenv(prefix + "QUEUE_DEPTH", str(queue_depth))),
+        queue_timeout=float(os.getenv(prefix + "QUEUE_TIMEOUT_SECONDS", str(queue_timeout))),
+        rate_per_minute=float(os.getenv(prefix + "RATE_PER_MINUTE", str(rate_per_minute))),
+        burst=int(os.getenv(prefix + "BURST", str(burst))),
+    )
+
+
+class LocalAdmissionStore:
+    """Slot counters and token buckets in this process."""
+
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        # A bucket untouched for its full refill time is full again, so it can simply expire
+        self._buckets = LRUTTLCache(maxsize=ADMISSION_BUCKET_CACHE_SIZE, ttl=3600)
+
+    async def try_acquire(self, key: str, limit: int, weight: int = 1) -> Optional[str]:
+        if self._slots.get(key, 0) + weight > limit:
+            return None
+        self._slots[key] = self._slots.get(key, 0) + weight
+        return key
+
+    async def release(self, key: str, lease: str, weight: int = 1) -> None:
+        remaining = self._slots.get(key, 0) - weight
+        if remaining > 0:
+            self._slots[key] = remaining
+        else:
+            self._slots.pop(key, None)
+
+    async def take_token(self, key: str, rate_per_second: float, burst: int, cost: int = 1) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (float(burst), now)
+        tokens = min(float(burst), tokens + (now - updated) * rate_per_second)
+        needed = min(cost, burst)
+        granted = tokens >= needed
+        if granted:
+            tokens -= cost
+        # Kept until it would have refilled, so a debt from a large batch is never forgotten early
+        self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate_per_second)
+        return 0.0 if granted else (needed - tokens) / rate_per_second
+
+
+class MongoAdmissionStore:
+    """Slot leases and token buckets in the ``admission`` collection.
+
+    Every check is one atomic pipeline update on a single document, evaluated
+    with the server clock ($$NOW), so workers never race or disagree on time.
+    """
+
+    async def try_acquire(self, key: str, limit: int, weight: int = 1) -> Optional[str]:
+        lease = uuid.uuid4().hex
+        lease_ms = int(ADMISSION_LEASE_SECONDS * 1000)
+        pipeline = [
+            # Drop leases whose holder never released them
+            {"$set": {"leases": {"$filter": {
+                "input": {"$ifNull": ["$leases", []]},
+                "cond": {"$gt": ["$$this.expires", "$$NOW"]},
+            }}}},
+            {"$set": {
+                "leases": {"$cond": [
+                    {"$lte": [
+                        {"$add": [{"$sum": {"$map": {
+                            "input": "$leases", "in": {"$ifNull": ["$$this.weight", 1]},
+                        }}}, weight]},
+                        limit,
+                    ]},
+                    {"$concatArrays": ["$leases", [
+                        {"id": lease, "weight": weight, "expires": {"$add": ["$$NOW", lease_ms]}},
+                    ]]},
+                    "$leases",
+                ]},
+                "expire_at": {"$add": ["$$NOW", lease_ms]},
+            }},
+        ]
+        entry = await self._upsert(key, pipeline, {"leases.id": 1})
+        return lease if any(held["id"] == lease for held in entry["leases"]) else None
+
+    async def release(self, key: str, lease: str, weight: int = 1) -> None:
+        await db.admission().update_one({"_id": key}, {"$pull": {"leases": {"id": lease}}})
+
+    async def take_token(self, key: str, rate_per_second: float, burst: int, cost: int = 1) -> float:
+        needed = min(cost, burst)
+        elapsed_seconds = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated", "$$NOW"]}]}, 1000]}
+        pipeline = [
+            {"$set": {
+                "tokens": {"$min": [burst, {"$add": [
+                    {"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed_seconds, rate_per_second]},
+                ]}]},
+                "updated": "$$NOW",
+            }},
+            {"$set": {"granted": {"$gte": ["$tokens", needed]}}},
+            {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            # Kept until it would have refilled, so a debt from a large batch is never forgotten early
+            {"$set": {"expire_at": {"$add": [
+                "$$NOW", {"$multiply": [{"$subtract": [burst, "$tokens"]}, 1000 / rate_per_second]},
+            ]}}},
+        ]
+        entry = await self._upsert(key, pipeline, {"tokens": 1, "granted": 1})
+        return 0.0 if entry["granted"] else (needed - entry["tokens"]) / rate_per_second
+
+    async def _upsert(self, key: str, pipeline: list, projection: dict) -> dict:
+        try:
+            return await db.admission().find_one_and_update(
+                {"_id": key}, pipeline, projection=projection, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two workers created the document at once; the loser retries as an update
+            return await db.admission().find_one_and_update(
+                {"_id": key}, pipeline, projection=projection, return_document=ReturnDocument.AFTER
+            )
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = MongoAdmissionStore() if ADMISSION_STORE == "mongo" else LocalAdmissionStore()
+    return _store
+
+
+@dataclass
+class Ticket:
+    username: str
+    user_lease: str
+    global_lease: str
+    slots: int = 1
+    released: bool = False
+
+
+class AdmissionController:
+    """Rate limit plus per-user and global concurrency limits for one kind of expensive call.
+
+    A request first takes a token from the user's bucket (429 when empty), then
+    waits up to ``queue_timeout`` for both a per-user and a global slot. At most
+    ``queue_depth`` requests wait at once (503 beyond that). Every rejection
+    carries Retry-After.
+
+    A batch is charged ``tokens`` (one per file) and holds ``slots`` (the files
+    it runs at once). A large batch is admitted once the bucket holds up to a
+    burst's worth; the rest is owed and delays the user's next request.
+    """
+
+    def __init__(self, kind: str, policy: AdmissionPolicy):
+        self.kind = kind
+        self.policy = policy
+        self.waiting = 0
+        self._released: Optional[asyncio.Event] = None
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: float) -> HTTPException:
+        metrics.admission_rejections_total.inc(self.kind, reason)
+        return HTTPException(status_code=status_code, detail=detail,
+                             headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    async def acquire(self, username: str, slots: int = 1, tokens: int = 1) -> Ticket:
+        store = get_store()
+        policy = self.policy
+        slots = max(1, min(slots, policy.user_limit, policy.global_limit))
+        wait_for_token = await store.take_token(
+            f"rate:{self.kind}:{username}", policy.rate_per_minute / 60, policy.burst, max(1, tokens)
+        )
+        if wait_for_token:
+            raise self._reject(429, "rate", f"Too many {self.kind} requests, please slow down", wait_for_token)
+
+        user_key, global_key = f"slots:{self.kind}:user:{username}", f"slots:{self.kind}:global"
+        deadline = time.monotonic() + policy.queue_timeout
+        queued = False
+        try:
+            while True:
+                user_lease = await store.try_acquire(user_key, policy.user_limit, slots)
+                if user_lease is not None:
+                    global_lease = await store.try_acquire(global_key, policy.global_limit, slots)
+                    if global_lease is not None:
+                        metrics.admission_in_flight.inc(self.kind, amount=slots)
+                        return Ticket(username, user_lease, global_lease, slots)
+                    await store.release(user_key, user_lease, slots)
+
+                if not queued:
+                    if self.waiting >= policy.queue_depth:
+                        raise self._reject(503, "queue_full", f"Too many pending {self.kind} requests", 1)
+                    queued = True
+                    self.waiting += 1
+                    metrics.admission_waiting.inc(self.kind)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if user_lease is None:
+                        raise self._reject(429, "user_busy",
+                                           f"You already have {policy.user_limit} {self.kind} requests in progress",
+                                           policy.queue_timeout)
+                    raise self._reject(503, "busy", f"Server is busy with {self.kind} requests", policy.queue_timeout)
+                await self._wait_for_release(min(remaining, ADMISSION_POLL_SECONDS))
+        finally:
+            if queued:
+                self.waiting -= 1
+                metrics.admission_waiting.dec(self.kind)
+
+    async def release(self, ticket: Ticket) -> None:
+        """Give both slots back. Safe to call more than once."""
+        if ticket.released:
+            return
+        ticket.released = True
+        store = get_store()
+        await store.release(f"slots:{self.kind}:global", ticket.global_lease, ticket.slots)
+        await store.release(f"slots:{self.kind}:user:{ticket.username}", ticket.user_lease, ticket.slots)
+        metrics.admission_in_flight.inc(self.kind, amount=-ticket.slots)
+        # Wake local waiters now; waiters in other workers notice on their next poll
+        if self._released is not None:
+            self._released.set()
+            self._released = None
+
+    async def _wait_for_release(self, timeout: float) -> None:
+        if self._released is None:
+            self._released = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._released.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+controllers = {
+    "transcribe": AdmissionController("transcribe", policy_from_env(
+        "transcribe", global_limit=32, user_limit=4, queue_depth=64, queue_timeout=30, rate_per_minute=30, burst=10,
+    )),
+    # The PDF process pool is the bottleneck, so fewer run at once
+    "pdf": AdmissionController("pdf", policy_from_env(
+        "pdf", global_limit=8, user_limit=2, queue_depth=32, queue_timeout=30, rate_per_minute=30, burst=10,
+    )),
+    "chat": AdmissionController("chat", policy_from_env(
+        "chat", global_limit=128, user_limit=8, queue_depth=256, queue_timeout=10, rate_per_minute=120, burst=30,
+    )),
+}
@@ -0,0 +1,128 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from dotenv import load_dotenv
+from utils import db, metrics
+from utils.cache import LRUTTLCache
+
+load_dotenv()
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Local tier, keyed by (transcript_id, digest) so a transcript's entries can be dropped together
+_local = LRUTTLCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL_SECONDS, name="answers")
+# Single-flight: digest -> future of the upstream call currently answering it
+_inflight: dict = {}
+
+
+class Uncached(str):
+    """An answer ``get_or_compute`` returns without storing, e.g. one from a fallback model."""
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def answer_key(transcript_id: str, user_id: str, question: str, model: str, params: dict) -> str:
+    # The user is part of the key so a cached answer is only ever served to the transcript's owner
+    material = json.dumps(
+        [transcript_id, user_id, normalize_question(question), model, params], sort_keys=True, default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def lookup(transcript_id: str, user_id: str, question: str, model: str, params: dict) -> Optional[str]:
+    """Cached answer from either tier, without computing anything on a miss."""
+    digest = answer_key(transcript_id, user_id, question, model, params)
+    answer = _local.get((transcript_id, digest))
+    if answer is not None:
+        metrics.answer_cache_requests_total.inc("local")
+        return answer
+
+    entry = await db.answer_cache().find_one({"_id": digest}, {"answer": 1})
+    if entry is None:
+        return None
+    metrics.answer_cache_requests_total.inc("shared")
+    _local.set((transcript_id, digest), entry["answer"])
+    return entry["answer"]
+
+
+async def store(transcript_id: str, user_id: str, question: str, model: str, params: dict, answer: str) -> None:
+    """Put a freshly computed answer into both tiers."""
+    digest = answer_key(transcript_id, user_id, question, model, params)
+    await db.answer_cache().update_one(
+        {"_id": digest},
+        {"$set": {
+            "transcript_id": transcript_id,
+            "user_id": user_id,
+            "question": normalize_question(question),
+            "answer": answer,
+            "created_at": datetime.now(timezone.utc),
+        }},
+        upsert=True,
+    )
+    _local.set((transcript_id, digest), answer)
+
+
+async def get_or_compute(transcript_id: str, user_id: str, question: str, model: str, params: dict,
+                         compute: Callable[[], Awaitable[str]]) -> str:
+    """Return a cached answer, or run ``compute`` once for all concurrent identical asks.
+
+    Lookup order: in-process LRU, then the shared MongoDB tier, then upstream.
+    Exceptions and ``Uncached`` answers are not cached.
+    """
+    digest = answer_key(transcript_id, user_id, question, model, params)
+
+    while True:
+        answer = _local.get((transcript_id, digest))
+        if answer is not None:
+            metrics.answer_cache_requests_total.inc("local")
+            return answer
+
+        pending = _inflight.get(digest)
+        if pending is None:
+            break
+        # asyncio.wait leaves ``pending`` alone if this request is cancelled, and
+        # returns (rather than raising) if the leader's request is
+        await asyncio.wait({pending})
+        if not pending.cancelled():
+            metrics.answer_cache_requests_total.inc("coalesced")
+            return pending.result()
+        # The leader's client went away: look again, and answer it ourselves if nobody else has started
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[digest] = future
+    try:
+        answer = await lookup(transcript_id, user_id, question, model, params)
+        if answer is None:
+            metrics.answer_cache_requests_total.inc("upstream")
+            answer = await compute()
+            if not isinstance(answer, Uncached):
+                await store(transcript_id, user_id, question, model, params, answer)
+
+        future.set_result(answer)
+        return answer
+
+    except asyncio.CancelledError:
+        # Waiters retry instead of failing with a cancellation that wasn't theirs
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved when nobody else was waiting
+        raise
+    finally:
+        del _inflight[digest]
+
+
+async def invalidate_transcript(transcript_id: str) -> None:
+    """Drop every cached answer for a transcript whose content changed."""
+    _local.discard_where(lambda key, _answer: key[0] == transcript_id)
+    await db.answer_cache().delete_many({"transcript_id": transcript_id})
+
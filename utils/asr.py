@@ -0,0 +1,159 @@
+import os
+import json
+import asyncio
+import hashlib
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from urllib.parse import urlencode
+import aiofiles
+from dotenv import load_dotenv
+from utils import db
+from utils.metrics import span
+from utils.services import registry
+from utils.uploads import UPLOAD_CHUNK_SIZE
+
+if TYPE_CHECKING:
+    from deepgram import DeepgramClient, PrerecordedOptions
+
+load_dotenv()
+
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Override to point at a self-hosted or fake Deepgram (e.g. http://127.0.0.1:9000)
+DEEPGRAM_URL = os.getenv("DEEPGRAM_URL")
+DEEPGRAM_MODEL = os.getenv("DEEPGRAM_MODEL", "nova-2")
+DEEPGRAM_LANGUAGE = os.getenv("DEEPGRAM_LANGUAGE", "en-US")
+DEEPGRAM_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", "300"))
+DEEPGRAM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_CONNECT_TIMEOUT_SECONDS", "10"))
+# Streaming endpoint; follows DEEPGRAM_URL (http -> ws, https -> wss) unless set explicitly
+DEEPGRAM_LIVE_URL = os.getenv("DEEPGRAM_LIVE_URL") or (
+    DEEPGRAM_URL.replace("http", "ws", 1) if DEEPGRAM_URL else "wss://api.deepgram.com"
+)
+SUMMARY_NOT_AVAILABLE = "Summary not available"
+
+
+def build_deepgram_client() -> "DeepgramClient":
+    """Create the Deepgram client; the SDK is only imported when this first runs."""
+    from deepgram import DeepgramClient, DeepgramClientOptions
+
+    return DeepgramClient(
+        api_key=DEEPGRAM_API_KEY,
+        config=DeepgramClientOptions(url=DEEPGRAM_URL) if DEEPGRAM_URL else None,
+    )
+
+
+registry.register("deepgram", build_deepgram_client)
+
+
+@dataclass
+class TranscriptionResult:
+    """The parts of a Deepgram response we keep: transcript text and summary."""
+
+    transcript: str
+    summary: str = SUMMARY_NOT_AVAILABLE
+
+    @classmethod
+    def from_response(cls, data: dict) -> "TranscriptionResult":
+        """Parse an already ``to_dict()``-ed prerecorded response."""
+        results = data.get("results") or {}
+        channels = results.get("channels")
+        if not channels:
+            raise ValueError("Invalid Deepgram response")
+
+        alternative = channels[0]["alternatives"][0]
+        # summarize="v2" puts the summary under results; v1 put it on the alternative
+        summary = (results.get("summary") or {}).get("short") or alternative.get("summary")
+        return cls(transcript=alternative["transcript"], summary=summary or SUMMARY_NOT_AVAILABLE)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def transcription_options() -> "PrerecordedOptions":
+    """Options for a single request returning both transcript and summary."""
+    from deepgram import PrerecordedOptions
+
+    return PrerecordedOptions(
+        smart_format=True,
+        model=DEEPGRAM_MODEL,
+        language=DEEPGRAM_LANGUAGE,
+        summarize="v2",
+    )
+
+
+def result_cache_key(content_sha256: str, options: "PrerecordedOptions") -> str:
+    """Cache key for an upload: SHA-256 of its content plus the request options."""
+    fingerprint = json.dumps(options.to_dict(), sort_keys=True)
+    return hashlib.sha256(f"{content_sha256}:{fingerprint}".encode("utf-8")).hexdigest()
+
+
+async def _file_chunks(file_path: str) -> AsyncIterator[bytes]:
+    async with aiofiles.open(file_path, "rb") as audio:
+        while chunk := await audio.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+async def transcribe_path(file_path: str, options: "PrerecordedOptions",
+                          deepgram: Optional["DeepgramClient"] = None) -> TranscriptionResult:
+    """Send one file to Deepgram once and parse the response once.
+
+    Uses the SDK's async REST client and streams the file from disk, so the
+    event loop stays free while Deepgram works. Cancelling the awaiting task
+    aborts the upstream request.
+    """
+    import httpx
+
+    deepgram = deepgram or registry.get("deepgram")
+    payload = {"stream": _file_chunks(file_path)}
+    timeout = httpx.Timeout(DEEPGRAM_TIMEOUT_SECONDS, connect=DEEPGRAM_CONNECT_TIMEOUT_SECONDS)
+    with span("deepgram_transcribe"):
+        response = await asyncio.wait_for(
+            deepgram.listen.asyncrest.v("1").transcribe_file(payload, options, timeout=timeout),
+            timeout=DEEPGRAM_TIMEOUT_SECONDS,
+        )
+    return TranscriptionResult.from_response(response.to_dict())
+
+
+async def get_cached_result(cache_key: str) -> Optional[TranscriptionResult]:
+    """Look up a previous result for identical media and options."""
+    entry = await db.asr_cache().find_one({"_id": cache_key}, {"transcript": 1, "summary": 1})
+    if entry is None:
+        return None
+    return TranscriptionResult(transcript=entry["transcript"], summary=entry["summary"])
+
+
+async def store_cached_result(cache_key: str, result: TranscriptionResult) -> None:
+    """Remember a result so re-uploads of the same media skip Deepgram."""
+    await db.asr_cache().update_one(
+        {"_id": cache_key},
+        {"$set": {**result.to_dict(), "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def live_options(**overrides) -> dict:
+    """Query parameters for a streaming session; ``None`` overrides are left out."""
+    options = {
+        "model": DEEPGRAM_MODEL,
+        "language": DEEPGRAM_LANGUAGE,
+        "smart_format": "true",
+        "interim_results": "true",
+    }
+    options.update({name: str(value) for name, value in overrides.items() if value is not None})
+    return options
+
+
+def connect_live(options: dict):
+    """Open a streaming connection to Deepgram's /v1/listen; use as ``async with``.
+
+    Audio goes out as binary messages and JSON ``Results`` come back. Sends
+    wait for the socket to drain, so a slow upstream slows the sender down
+    instead of buffering audio in memory.
+    """
+    from websockets.asyncio.client import connect
+
+    return connect(
+        f"{DEEPGRAM_LIVE_URL}/v1/listen?{urlencode(options)}",
+        additional_headers={"Authorization": f"Token {DEEPGRAM_API_KEY}"},
+        open_timeout=DEEPGRAM_CONNECT_TIMEOUT_SECONDS,
+    )
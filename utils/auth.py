@@ -4,6 +4,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from utils.metrics import span
 
 load_dotenv()
 
@@ -21,7 +22,8 @@ def get_password_hash(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify the provided password with hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with span("bcrypt_verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -38,14 +40,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[str]:
-    """Decode JWT token and get username."""
+def decode_access_token_payload(token: str) -> Optional[dict]:
+    """Decode and validate JWT token, returning its claims."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-
-        if username is None:
-            return None
-        return username
     except JWTError:
         return None
+
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+
+def decode_access_token(token: str) -> Optional[str]:
+    """Decode JWT token and get username."""
+    payload = decode_access_token_payload(token)
+    if payload is None:
+        return None
+    return payload["sub"]
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional
+from fastapi import HTTPException
+from utils import metrics
+
+
+class MicroBatcher:
+    """Groups concurrent requests into batches for a model that is faster batched.
+
+    Callers ``await submit(item)``. A single scheduler task collects items until
+    ``max_batch_size`` is reached or ``max_wait`` seconds have passed since the
+    first one, then runs ``run_batch(items) -> results`` on a dedicated worker
+    thread (one forward pass) and hands each caller its own result. Batch
+    sizes, per-batch latency and queue depth are exported under ``name``.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], List[Any]], max_batch_size: int,
+                 max_wait: float, max_queue: int, name: str = "batch"):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._schedule())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result; 503 when the queue is full."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail=f"{self.name} queue is full, please retry later",
+                                headers={"Retry-After": "1"})
+        metrics.qa_queue_depth.set(self._queue.qsize(), self.name)
+        return await future
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up (cancelled / disconnected) don't need a forward pass
+        return [(item, future) for item, future in batch if not future.cancelled()]
+
+    async def _schedule(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            metrics.qa_queue_depth.set(self._queue.qsize(), self.name)
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.run_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            metrics.qa_batch_seconds.observe(time.perf_counter() - started, self.name)
+            metrics.qa_batch_size.observe(len(batch), self.name)
+
+
+async def map_bounded(func: Callable[[Any], Awaitable[Any]], items: List[Any], limit: int) -> List[Any]:
+    """``await func(item)`` for every item, at most ``limit`` at once, results in input order.
+
+    A failing item does not affect the others: its exception is returned in
+    place of its result.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+
+def error_status(error: BaseException) -> dict:
+    """Per-item error entry for batch responses."""
+    if isinstance(error, HTTPException):
+        return {"status": "error", "status_code": error.status_code, "detail": error.detail}
+    return {"status": "error", "status_code": 500, "detail": str(error)}
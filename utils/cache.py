@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from utils import metrics
+
+
+class LRUTTLCache:
+    """Size-bounded LRU cache whose entries also expire after a TTL.
+
+    Not thread-safe: it is meant to be used from the event loop only, where no
+    await happens between a lookup and the update that follows it. Caches given
+    a ``name`` export their hits, misses and size to /metrics.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._record("miss")
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._record("miss")
+            return None
+
+        self._entries.move_to_end(key)
+        self._record("hit")
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value; ``ttl`` may only shorten the cache-wide TTL."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        self._record_size()
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a single entry if present."""
+        self._entries.pop(key, None)
+        self._record_size()
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which ``predicate(key, value)`` is true."""
+        stale = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+        for key in stale:
+            del self._entries[key]
+        self._record_size()
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._record_size()
+
+    def _record(self, result: str) -> None:
+        if self.name:
+            metrics.cache_lookups_total.inc(self.name, result)
+
+    def _record_size(self) -> None:
+        if self.name:
+            metrics.cache_entries.set(len(self._entries), self.name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,112 @@
+import os
+from typing import Optional
+import certifi
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING, TEXT
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from dotenv import load_dotenv
+from utils.metrics import MongoCommandTimer
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "llm_chatbot")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "10000"))
+
+_client: Optional[AsyncMongoClient] = None
+
+
+async def connect() -> None:
+    """Create the process-wide MongoDB client. Called once from the app lifespan."""
+    global _client
+    if _client is not None:
+        return
+
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGODB_TIMEOUT_MS,
+        "event_listeners": [MongoCommandTimer()],
+    }
+    # Atlas (mongodb+srv) needs the certifi bundle on slim images; a local mongod does not.
+    if MONGODB_URI and MONGODB_URI.startswith("mongodb+srv://"):
+        options["tlsCAFile"] = certifi.where()
+
+    _client = AsyncMongoClient(MONGODB_URI, **options)
+
+
+async def close() -> None:
+    """Close the shared client and release its connection pool."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes the routers rely on. Idempotent; called at startup."""
+    from utils.answer_cache import ANSWER_CACHE_TTL_SECONDS
+
+    await transcriptions().create_index([("transcript_id", ASCENDING)], name="transcript_id")
+    # Per-user listing pages newest-first on _id
+    await transcriptions().create_index([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_id")
+    await transcript_bodies().create_index(
+        [("transcript_id", ASCENDING), ("seq", ASCENDING)], name="transcript_id_seq", unique=True
+    )
+    await transcript_chunks().create_index([("transcript_id", ASCENDING), ("index", ASCENDING)], name="transcript_id_index")
+    # Inverted index for /transcripts/search; the user_id prefix keeps each query to one user's postings
+    await transcript_chunks().create_index(
+        [("user_id", ASCENDING), ("text", TEXT)], name="user_id_text", default_language="english"
+    )
+    await answer_cache().create_index([("transcript_id", ASCENDING)], name="transcript_id")
+    await admission().create_index([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0)
+    await answer_cache().create_index(
+        [("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=ANSWER_CACHE_TTL_SECONDS
+    )
+
+
+def get_db() -> AsyncDatabase:
+    """Return the application database on the shared client."""
+    if _client is None:
+        raise RuntimeError("MongoDB client is not connected; call utils.db.connect() first")
+    return _client[MONGODB_DB_NAME]
+
+
+def users() -> AsyncCollection:
+    """Collection holding registered users."""
+    return get_db()["users"]
+
+
+def transcriptions() -> AsyncCollection:
+    """Transcript metadata for audio and PDFs; the text lives in transcript_bodies."""
+    return get_db()["transcriptions"]
+
+
+def transcript_bodies() -> AsyncCollection:
+    """Transcript text, zlib-compressed and chunked, kept apart from the metadata."""
+    return get_db()["transcript_bodies"]
+
+
+def asr_cache() -> AsyncCollection:
+    """Deepgram results keyed by content hash and request options."""
+    return get_db()["asr_cache"]
+
+
+def jobs() -> AsyncCollection:
+    """Background transcription / PDF processing jobs and their results."""
+    return get_db()["jobs"]
+
+
+def transcript_chunks() -> AsyncCollection:
+    """Retrieval index: transcript chunks with offsets and term frequencies."""
+    return get_db()["transcript_chunks"]
+
+
+def answer_cache() -> AsyncCollection:
+    """Shared tier of the /chat answer cache (expired by a TTL index)."""
+    return get_db()["answer_cache"]
+
+
+def admission() -> AsyncCollection:
+    """Shared admission-control slot leases and rate-limit buckets (ADMISSION_STORE=mongo)."""
+    return get_db()["admission"]
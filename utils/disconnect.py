@@ -0,0 +1,28 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` but cancel it as soon as the HTTP client goes away.
+
+    Long upstream calls (Deepgram, LLM) would otherwise keep running, and
+    billing, for a response nobody will read.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                # 499: nginx's "client closed request"; nobody receives it anyway
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
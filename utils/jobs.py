@@ -0,0 +1,192 @@
+import os
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from utils import db
+from utils.uploads import remove_quietly
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+# Queued plus running files one user may have in this worker, so nobody can fill the queue alone
+JOB_USER_LIMIT = int(os.getenv("JOB_USER_LIMIT", "8"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "2"))
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+
+class PermanentError(HTTPException):
+    """An HTTP error that will recur on every attempt (e.g. an unusable upstream response).
+
+    The job runner fails the job at once instead of retrying.
+    """
+
+_handlers: dict = {}
+_queue: Optional[asyncio.Queue] = None
+_workers: list = []
+# user_id -> files in that user's queued and running jobs in this worker
+_user_jobs: dict = {}
+
+
+def register_handler(kind: str, handler: JobHandler) -> None:
+    """Register the coroutine that runs jobs of ``kind``; it gets the job payload."""
+    _handlers[kind] = handler
+
+
+async def start() -> None:
+    """Create the bounded queue and the worker tasks. Called from the app lifespan."""
+    global _queue
+    _queue = asyncio.Queue(maxsize=JOB_QUEUE_DEPTH)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(JOB_WORKERS))
+
+
+async def stop() -> None:
+    """Cancel the workers; jobs still queued stay 'queued' in MongoDB."""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _user_jobs.clear()
+    _queue = None
+
+
+async def submit(kind: str, user_id: str, payload: dict) -> str:
+    """Persist a job record and queue it; 429 when the user already has
+    JOB_USER_LIMIT files pending, 503 when the queue is full.
+
+    If ``payload`` has a ``file_path`` (or a ``files`` list of payloads with
+    one each) the job takes ownership of those files and removes them once the
+    job has finished, whatever the outcome.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for {kind!r}")
+    if _queue is None or _queue.full():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many queued jobs, please retry later",
+            headers={"Retry-After": str(int(JOB_RETRY_BACKOFF_SECONDS * 5) or 1)},
+        )
+    weight = _weight(payload)
+    if _user_jobs.get(user_id, 0) + weight > JOB_USER_LIMIT:
+        raise HTTPException(
+            status_code=429,
+            detail=f"You already have too many files pending (limit {JOB_USER_LIMIT}), please wait for them to finish",
+            headers={"Retry-After": str(int(JOB_RETRY_BACKOFF_SECONDS * 5) or 1)},
+        )
+
+    now = datetime.now(timezone.utc)
+    job = {
+        "_id": str(uuid.uuid4()),
+        "kind": kind,
+        "user_id": user_id,
+        "status": "queued",
+        "attempts": 0,
+        "weight": weight,
+        "payload": payload,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db.jobs().insert_one(job)
+    _queue.put_nowait(job)
+    _user_jobs[user_id] = _user_jobs.get(user_id, 0) + weight
+    return job["_id"]
+
+
+async def get_job(job_id: str, user_id: str) -> Optional[dict]:
+    """Return a job's public view, only if it belongs to ``user_id``."""
+    job = await db.jobs().find_one({"_id": job_id, "user_id": user_id}, {"payload": 0, "weight": 0})
+    if job is None:
+        return None
+    job["job_id"] = job.pop("_id")
+    return job
+
+
+def queue_depth() -> int:
+    return _queue.qsize() if _queue is not None else 0
+
+
+async def _update(job_id: str, **fields) -> None:
+    fields["updated_at"] = datetime.now(timezone.utc)
+    await db.jobs().update_one({"_id": job_id}, {"$set": fields})
+
+
+def _is_transient(error: Exception) -> bool:
+    # Client errors (bad upload, no text in PDF...) and PermanentErrors will fail
+    # the same way again. Handlers keep their transcript_ids across attempts, so
+    # retrying after a partial write overwrites it rather than duplicating it.
+    if isinstance(error, PermanentError):
+        return False
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500
+    return not isinstance(error, ValueError)
+
+
+async def _run(job: dict) -> None:
+    handler = _handlers[job["kind"]]
+    try:
+        for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+            await _update(job["_id"], status="running", attempts=attempt)
+            try:
+                result = await handler(job["payload"])
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                if attempt == JOB_MAX_ATTEMPTS or not _is_transient(e):
+                    await _update(job["_id"], status="failed", error=error)
+                    return
+                print(f"Job {job['_id']} attempt {attempt} failed, retrying: {error}")
+                await asyncio.sleep(JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            else:
+                try:
+                    await _update(job["_id"], status="succeeded", result=_stored_result(result), error=None)
+                except Exception as e:
+                    # Otherwise the job would stay "running" forever
+                    await _update(job["_id"], status="failed", error=f"Could not record the job result: {str(e)}")
+                return
+    finally:
+        _finished(job["user_id"], job["weight"])
+        remove_quietly(job["payload"].get("file_path"))
+        for item in job["payload"].get("files", []):
+            remove_quietly(item.get("file_path"))
+
+
+def _stored_result(result: dict) -> dict:
+    """A handler's result without the transcript text, which can be far bigger than a MongoDB document.
+
+    Clients fetch the text from /transcripts/{transcript_id}.
+    """
+    stored = {key: value for key, value in result.items() if key != "transcript"}
+    if "transcript" in result:
+        stored["transcript_length"] = len(result["transcript"] or "")
+    return stored
+
+
+def _weight(payload: dict) -> int:
+    """Files a job processes; a batch bigger than the whole allowance takes all of it."""
+    return max(1, min(len(payload.get("files", [])) or 1, JOB_USER_LIMIT))
+
+
+def _finished(user_id: str, weight: int) -> None:
+    remaining = _user_jobs.get(user_id, 0) - weight
+    if remaining > 0:
+        _user_jobs[user_id] = remaining
+    else:
+        _user_jobs.pop(user_id, None)
+
+
+async def _worker() -> None:
+    while True:
+        job = await _queue.get()
+        try:
+            await _run(job)
+        except Exception as e:
+            print(f"Job {job['_id']} crashed: {str(e)}")
+        finally:
+            _queue.task_done()
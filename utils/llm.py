@@ -1,51 +1,185 @@
 import os
-import aiohttp
 import json
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import aiohttp
 from dotenv import load_dotenv
+from utils.metrics import span
 
 load_dotenv()
 
 HUGGINGFACE_API_KEY = os.getenv("HF_KEY")
-HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.1"
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.1")
+GENERATION_PARAMETERS = {"max_length": 200, "temperature": 0.7, "top_p": 0.9}
+
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "100"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+# Longest upstream Retry-After worth waiting out; longer hints fail the request instead
+LLM_MAX_RETRY_AFTER_SECONDS = float(os.getenv("LLM_MAX_RETRY_AFTER_SECONDS", "10"))
+RETRYABLE_STATUSES = {429, 503}
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+class LLMError(Exception):
+    """Base class for failures talking to the inference backend."""
+
+
+class LLMUpstreamError(LLMError):
+    """The backend answered with a non-200 status or an error payload."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Hugging Face API returned {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class LLMTimeoutError(LLMError):
+    """The backend did not answer within the configured timeouts."""
+
+
+class LLMResponseError(LLMError):
+    """The backend answered 200 but not in a shape we understand."""
+
+
+async def start_session() -> None:
+    """Open the app-wide keep-alive session. Called from the app lifespan."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=LLM_POOL_SIZE,
+            limit_per_host=LLM_POOL_SIZE,
+            keepalive_timeout=LLM_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=LLM_CONNECT_TIMEOUT_SECONDS, sock_read=LLM_READ_TIMEOUT_SECONDS
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"},
+        )
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """The shared session, opened on demand for callers outside the app (scripts)."""
+    if _session is None or _session.closed:
+        await start_session()
+    return _session
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str]) -> Optional[float]:
+    """Seconds to wait before the next attempt, or None if upstream asks for longer than we'll wait."""
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+        return delay if delay <= min(LLM_MAX_RETRY_AFTER_SECONDS, LLM_READ_TIMEOUT_SECONDS) else None
+    # Full jitter: spreads out retries from many workers hitting the same 429
+    return random.uniform(0, LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+
+
+@asynccontextmanager
+async def inference_response(payload: dict) -> AsyncIterator[aiohttp.ClientResponse]:
+    """Open a 200 response from the inference endpoint, retrying 429/503 with jittered backoff.
+
+    Retries only happen before any of the body has been consumed.
+    """
+    session = await get_session()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with session.post(HF_API_URL, json=payload) as response:
+                if response.status == 200:
+                    yield response
+                    return
+
+                body = await response.text()
+                delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+                if response.status not in RETRYABLE_STATUSES or attempt == LLM_MAX_RETRIES or delay is None:
+                    raise LLMUpstreamError(response.status, body[:500])
+
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError("Timed out waiting for the Hugging Face API")
+        except aiohttp.ClientError as e:
+            raise LLMError(f"Could not reach the Hugging Face API: {str(e)}")
+
+        await asyncio.sleep(delay)
+
+
+async def post_inference(payload: dict) -> object:
+    """POST a non-streaming request and return the decoded JSON body."""
+    async with inference_response(payload) as response:
+        return await response.json()
+
+
+def build_prompt(transcript_text: str, question: str) -> str:
+    return f"Use the transcript to answer the question.\n\nTranscript: {transcript_text}\n\nQuestion: {question}\nAnswer:"
+
+
+def extract_answer(response_data: object) -> str:
+    """Pull the answer out of a text-generation response."""
+    if isinstance(response_data, list) and len(response_data) > 0:
+        generated_text = response_data[0]["generated_text"].strip()
+
+        # ✅ Extract answer after "Answer:"
+        if "Answer:" in generated_text:
+            return generated_text.split("Answer:")[-1].strip()
+        return generated_text
+
+    if isinstance(response_data, dict) and "error" in response_data:
+        raise LLMUpstreamError(200, str(response_data["error"]))
+    raise LLMResponseError("No valid response from Hugging Face API")
 
 
 async def query_llm(transcript_text: str, question: str) -> str:
-    try:
-        prompt = f"Use the transcript to answer the question.\n\nTranscript: {transcript_text}\n\nQuestion: {question}\nAnswer:"
-
-        payload = {
-            "inputs": prompt,
-            "parameters": {"max_length": 200, "temperature": 0.7, "top_p": 0.9},
-        }
-
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(HF_API_URL, headers=headers, json=payload) as response:
-                if response.status != 200:
-                    raise Exception(f"Error from Hugging Face API: {response.status}")
-                
-                response_data = await response.json()
-
-        # ✅ Extract the answer properly
-        if isinstance(response_data, list) and len(response_data) > 0:
-            generated_text = response_data[0]["generated_text"].strip()
-
-            # ✅ Extract answer after "Answer:"
-            if "Answer:" in generated_text:
-                answer = generated_text.split("Answer:")[-1].strip()
-            else:
-                answer = generated_text
-
-            return answer
-
-        elif "error" in response_data:
-            raise Exception(response_data["error"])
-        else:
-            return "Error: No valid response from Hugging Face API."
-
-    except Exception as e:
-        return f"Error during LLM processing: {str(e)}"
+    """Answer ``question`` from ``transcript_text``; raises LLMError on failure."""
+    payload = {
+        "inputs": build_prompt(transcript_text, question),
+        "parameters": GENERATION_PARAMETERS,
+    }
+    with span("hf_inference"):
+        response_data = await post_inference(payload)
+    return extract_answer(response_data)
+
+
+async def stream_llm(transcript_text: str, question: str) -> AsyncIterator[str]:
+    """Yield answer tokens as the backend generates them (text-generation SSE stream).
+
+    Closing the generator (e.g. the client went away) closes the upstream
+    connection, which stops generation on the server.
+    """
+    payload = {
+        "inputs": build_prompt(transcript_text, question),
+        "parameters": GENERATION_PARAMETERS,
+        "stream": True,
+    }
+    async with inference_response(payload) as response:
+        try:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+
+                event = json.loads(line[len("data:"):])
+                if "error" in event:
+                    raise LLMUpstreamError(200, str(event["error"]))
+
+                token = event.get("token") or {}
+                if token.get("text") and not token.get("special"):
+                    yield token["text"]
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError("Timed out waiting for the Hugging Face API")
+        except aiohttp.ClientError as e:
+            raise LLMError(f"Hugging Face stream interrupted: {str(e)}")
@@ -1,29 +1,167 @@
-from transformers import AutoModelForQuestionAnswering, AutoTokenizer, pipeline
+import os
+import threading
+from typing import AsyncIterator, List
+import numpy as np
+from dotenv import load_dotenv
+from utils.batching import MicroBatcher
+
+load_dotenv()
 
 # ✅ Define model name
 model_name = "deepset/roberta-large-squad2"
 
-# ✅ Initialize pipeline for question answering
-qa_pipeline = pipeline('question-answering', model=model_name, tokenizer=model_name)
+QA_MAX_BATCH_SIZE = int(os.getenv("QA_MAX_BATCH_SIZE", "8"))
+QA_MAX_WAIT_MS = float(os.getenv("QA_MAX_WAIT_MS", "10"))
+QA_QUEUE_DEPTH = int(os.getenv("QA_QUEUE_DEPTH", "256"))
+# int8 dynamic quantization of the Linear layers (CPU only): smaller and faster, slightly less exact
+QA_QUANTIZE = os.getenv("QA_QUANTIZE", "false").lower() in ("1", "true", "yes")
+# Sliding window over long contexts, in tokens
+QA_WINDOW_TOKENS = int(os.getenv("QA_WINDOW_TOKENS", "384"))
+QA_WINDOW_STRIDE = int(os.getenv("QA_WINDOW_STRIDE", "128"))
+QA_WINDOW_BATCH = int(os.getenv("QA_WINDOW_BATCH", "16"))
+QA_MAX_ANSWER_TOKENS = int(os.getenv("QA_MAX_ANSWER_TOKENS", "30"))
+QA_TOP_CANDIDATES = 20
 
+NO_ANSWER = "Sorry, I couldn't find an answer in the transcript."
+
+_model = None
+_tokenizer = None
+_load_lock = threading.Lock()
+
+
+def load_model():
+    """Load tokenizer and model on first use (or from warm_up); returns both.
+
+    torch/transformers are imported here rather than at module import, so
+    importing this module stays cheap for processes that never answer locally.
+    """
+    global _model, _tokenizer
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                import torch
+                from transformers import AutoModelForQuestionAnswering, AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+                model.eval()
+                if QA_QUANTIZE:
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                _tokenizer, _model = tokenizer, model
+    return _model, _tokenizer
+
+
+def warm_up() -> None:
+    """Load the model and run one tiny forward pass so the first request isn't slow."""
+    answer_batch([{"question": "What is this?", "context": "This is a warm-up."}])
+
+
+def _best_span(start_logits: np.ndarray, end_logits: np.ndarray, context_mask: np.ndarray):
+    """Highest-scoring (score, start, end) token span inside the context of one window."""
+    start_logits = np.where(context_mask, start_logits, -np.inf)
+    end_logits = np.where(context_mask, end_logits, -np.inf)
+    starts = np.argsort(start_logits)[::-1][:QA_TOP_CANDIDATES]
+    ends = np.argsort(end_logits)[::-1][:QA_TOP_CANDIDATES]
+
+    best = (-np.inf, 0, 0)
+    for start in starts:
+        for end in ends:
+            if end < start or end - start + 1 > QA_MAX_ANSWER_TOKENS:
+                continue
+            score = start_logits[start] + end_logits[end]
+            if score > best[0]:
+                best = (score, int(start), int(end))
+    return best
 
-async def query_llm2(transcript_text: str, question: str) -> str:
-    try:
-        # ✅ Prepare input for the model
-        QA_input = {
-            'question': question,
-            'context': transcript_text
-        }
 
-        result = qa_pipeline(QA_input)
+def answer_batch(items: List[dict]) -> List[str]:
+    """Answer ``{"question", "context"}`` items with one tokenization and batched window passes.
 
-        # ✅ Extract and return the answer
-        answer = result['answer'].strip()
+    Every item's context is split into overlapping windows of QA_WINDOW_TOKENS
+    in a single tokenizer call; all windows of all items are scored in batches
+    of QA_WINDOW_BATCH, and each item takes its best span across its windows.
+    """
+    import torch
 
-        if not answer:
-            return "Sorry, I couldn't find an answer in the transcript."
+    model, tokenizer = load_model()
+    encoded = tokenizer(
+        [item["question"] for item in items],
+        [item["context"] for item in items],
+        truncation="only_second",
+        max_length=QA_WINDOW_TOKENS,
+        stride=QA_WINDOW_STRIDE,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True,
+        padding="max_length",
+        return_tensors="np",
+    )
+    sample_of_window = encoded["overflow_to_sample_mapping"]
+    offsets = encoded["offset_mapping"]
+    context_masks = np.array(
+        [[sequence_id == 1 for sequence_id in encoded.sequence_ids(window)] for window in range(len(sample_of_window))]
+    )
 
-        return answer
+    start_logits, end_logits = [], []
+    with torch.inference_mode():
+        for first in range(0, len(sample_of_window), QA_WINDOW_BATCH):
+            window_slice = slice(first, first + QA_WINDOW_BATCH)
+            outputs = model(
+                input_ids=torch.from_numpy(encoded["input_ids"][window_slice]),
+                attention_mask=torch.from_numpy(encoded["attention_mask"][window_slice]),
+            )
+            start_logits.append(outputs.start_logits.numpy())
+            end_logits.append(outputs.end_logits.numpy())
+    start_logits = np.concatenate(start_logits)
+    end_logits = np.concatenate(end_logits)
+
+    best = [(-np.inf, None, 0, 0)] * len(items)
+    for window, sample in enumerate(sample_of_window):
+        score, start, end = _best_span(start_logits[window], end_logits[window], context_masks[window])
+        if score > best[sample][0]:
+            best[sample] = (score, window, start, end)
+
+    # ✅ Map the winning token spans back to text
+    answers = []
+    for item, (score, window, start, end) in zip(items, best):
+        if window is None:
+            answers.append(NO_ANSWER)
+            continue
+        char_start, char_end = offsets[window][start][0], offsets[window][end][1]
+        answers.append(item["context"][char_start:char_end].strip() or NO_ANSWER)
+    return answers
+
+
+# Concurrent questions are queued and answered together on a dedicated thread
+qa_batcher = MicroBatcher(
+    answer_batch,
+    max_batch_size=QA_MAX_BATCH_SIZE,
+    max_wait=QA_MAX_WAIT_MS / 1000,
+    max_queue=QA_QUEUE_DEPTH,
+    name="qa",
+)
+
+
+async def answer_span(transcript_text: str, question: str) -> str:
+    # ✅ Prepare input for the model
+    QA_input = {
+        'question': question,
+        'context': transcript_text
+    }
+    return await qa_batcher.submit(QA_input)
+
+
+async def query_llm2(transcript_text: str, question: str) -> str:
+    try:
+        return await answer_span(transcript_text, question)
 
     except Exception as e:
         return f"Error during LLM processing: {str(e)}"
+
+
+async def stream_llm2(transcript_text: str, question: str) -> AsyncIterator[str]:
+    """Streaming counterpart of query_llm2 for the chat SSE endpoint.
+
+    Extractive QA selects a span rather than generating tokens, so the whole
+    answer arrives as one chunk.
+    """
+    yield await answer_span(transcript_text, question)
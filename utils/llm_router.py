@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+from collections import deque
+from importlib.util import find_spec
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from utils import metrics
+from utils.llm import LLMError, query_llm
+
+load_dotenv()
+
+# Use the local extractive QA model as a hedge/fallback (needs torch + transformers)
+LLM_LOCAL_QA_ENABLED = os.getenv("LLM_LOCAL_QA_ENABLED", "true").lower() in ("1", "true", "yes")
+# Local QA runs one forward pass per ~384-token window, so long contexts stay remote
+LLM_LOCAL_MAX_CONTEXT_CHARS = int(os.getenv("LLM_LOCAL_MAX_CONTEXT_CHARS", "20000"))
+# Generated answers read better than extracted spans: local only leads when this many times faster
+LLM_LOCAL_HANDICAP = float(os.getenv("LLM_LOCAL_HANDICAP", "2"))
+# Recent calls per backend that latency percentiles and error rates are computed over
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "200"))
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "20"))
+# Consecutive failures that take a backend out of rotation, and for how long
+LLM_ROUTER_TRIP_FAILURES = int(os.getenv("LLM_ROUTER_TRIP_FAILURES", "3"))
+LLM_ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+# Hedge after the primary's recent p95 (times this factor), within these bounds
+LLM_HEDGE_P95_FACTOR = float(os.getenv("LLM_HEDGE_P95_FACTOR", "1"))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.25"))
+LLM_HEDGE_MAX_SECONDS = float(os.getenv("LLM_HEDGE_MAX_SECONDS", "10"))
+# Hedge deadline (and assumed p95) until a backend has LLM_ROUTER_MIN_SAMPLES calls
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "3"))
+
+REMOTE = "remote"
+LOCAL = "local"
+
+
+class BackendStats:
+    """Sliding window of one backend's recent latencies and outcomes, plus a failure breaker."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: deque = deque(maxlen=LLM_ROUTER_WINDOW)
+        self.outcomes: deque = deque(maxlen=LLM_ROUTER_WINDOW)
+        self.failures_in_row = 0
+        self.cooldown_until = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.latencies.append(seconds)
+        self.outcomes.append(ok)
+        if ok:
+            self.failures_in_row = 0
+        else:
+            self.failures_in_row += 1
+            if self.failures_in_row >= LLM_ROUTER_TRIP_FAILURES:
+                self.cooldown_until = time.monotonic() + LLM_ROUTER_COOLDOWN_SECONDS
+        self.publish()
+
+    def record_abandoned(self, seconds: float) -> None:
+        """A call cancelled because the other backend won took at least ``seconds``.
+
+        Counting it as a lower bound keeps the losers' slow tail in the p95;
+        dropping it would make a slow backend look fast.
+        """
+        self.latencies.append(seconds)
+        self.publish()
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < LLM_ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def expected_seconds(self) -> float:
+        """Tail latency, inflated by the error rate (a failure costs a whole extra attempt)."""
+        p95 = self.p95()
+        p95 = LLM_HEDGE_DEFAULT_SECONDS if p95 is None else p95
+        return p95 * (1 + self.error_rate())
+
+    def hedge_after(self) -> float:
+        p95 = self.p95()
+        if p95 is None:
+            return LLM_HEDGE_DEFAULT_SECONDS
+        return min(LLM_HEDGE_MAX_SECONDS, max(LLM_HEDGE_MIN_SECONDS, p95 * LLM_HEDGE_P95_FACTOR))
+
+    def publish(self) -> None:
+        """Mirror what routing decisions see into /metrics."""
+        p95 = self.p95()
+        if p95 is not None:
+            metrics.llm_backend_p95_seconds.set(p95, self.name)
+        metrics.llm_backend_error_rate.set(self.error_rate(), self.name)
+        metrics.llm_backend_healthy.set(1.0 if self.healthy() else 0.0, self.name)
+
+
+stats: Dict[str, BackendStats] = {REMOTE: BackendStats(REMOTE), LOCAL: BackendStats(LOCAL)}
+_local_installed: Optional[bool] = None
+# Set once warm_up_local has loaded the model; until then nothing is routed to it
+_local_ready = False
+
+
+class RoutedAnswer(NamedTuple):
+    answer: str
+    # Backend whose answer was used
+    backend: str
+    # "primary" (one request), "hedge" (primary too slow, both asked) or "fallback" (primary failed)
+    path: str
+
+
+async def _ask_local(transcript_text: str, question: str) -> str:
+    from utils.llm2 import answer_span  # Loads the local model on first use
+
+    return await answer_span(transcript_text, question)
+
+
+BACKENDS: Dict[str, Callable[[str, str], Awaitable[str]]] = {REMOTE: query_llm, LOCAL: _ask_local}
+
+
+def local_installed() -> bool:
+    global _local_installed
+    if _local_installed is None:
+        _local_installed = (
+            LLM_LOCAL_QA_ENABLED and find_spec("torch") is not None and find_spec("transformers") is not None
+        )
+    return _local_installed
+
+
+def local_available() -> bool:
+    return _local_ready and local_installed()
+
+
+async def warm_up_local() -> None:
+    """Download and load the local model off the request path, then let the router use it.
+
+    Started in the background from the app lifespan. Loading takes from
+    seconds to minutes (the first run downloads the model); meanwhile /chat
+    stays remote-only rather than hedging into a model that is still loading.
+    """
+    global _local_ready
+    if not local_installed():
+        return
+    from utils import llm2
+
+    try:
+        await asyncio.to_thread(llm2.warm_up)
+    except Exception as e:
+        print(f"Local QA model failed to load, /chat stays remote-only: {str(e)}")
+        return
+    _local_ready = True
+    metrics.llm_local_model_loaded.set(1.0)
+    print("Local QA model loaded, /chat can hedge to it")
+
+
+def choose_backends(context_chars: int) -> Tuple[str, Optional[str]]:
+    """(primary, hedge) for a context of ``context_chars``; hedge is None when there's no alternative.
+
+    Backends in cooldown are skipped unless nothing else can serve the request.
+    The primary is the one with the lowest expected tail latency, local
+    counting LLM_LOCAL_HANDICAP times slower.
+    """
+    candidates = [REMOTE]
+    if local_available() and context_chars <= LLM_LOCAL_MAX_CONTEXT_CHARS:
+        candidates.append(LOCAL)
+    pool = [name for name in candidates if stats[name].healthy()] or candidates
+
+    def score(name: str) -> float:
+        return stats[name].expected_seconds() * (LLM_LOCAL_HANDICAP if name == LOCAL else 1)
+
+    ordered = sorted(pool, key=score)
+    return ordered[0], (ordered[1] if len(ordered) > 1 else None)
+
+
+async def _timed_call(name: str, transcript_text: str, question: str) -> str:
+    started = time.perf_counter()
+    try:
+        answer = await BACKENDS[name](transcript_text, question)
+    except asyncio.CancelledError:
+        elapsed = time.perf_counter() - started
+        stats[name].record_abandoned(elapsed)
+        metrics.llm_backend_seconds.observe(elapsed, name, "abandoned")
+        raise
+    except Exception:
+        elapsed = time.perf_counter() - started
+        stats[name].record(elapsed, ok=False)
+        metrics.llm_backend_seconds.observe(elapsed, name, "error")
+        raise
+    elapsed = time.perf_counter() - started
+    stats[name].record(elapsed, ok=True)
+    metrics.llm_backend_seconds.observe(elapsed, name, "ok")
+    return answer
+
+
+async def route_answer(transcript_text: str, question: str) -> RoutedAnswer:
+    """Answer from whichever backend is expected to be fastest, hedging against its slow tail.
+
+    If the primary hasn't answered by its recent p95, the same question goes
+    to the other backend as well and the first answer wins; the loser is
+    cancelled. If the primary fails, the other backend is asked at once. When
+    every backend fails, the remote LLMError is raised (mapped to 502/503/504
+    by the caller), else the local error.
+    """
+    primary, secondary = choose_backends(len(transcript_text))
+    tasks: Dict[asyncio.Task, str] = {
+        asyncio.create_task(_timed_call(primary, transcript_text, question)): primary
+    }
+    errors: List[Exception] = []
+    path = "primary"
+    timeout = stats[primary].hedge_after() if secondary is not None else None
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            timeout = None
+            for task in done:
+                name = tasks.pop(task)
+                if task.exception() is None:
+                    metrics.llm_routes_total.inc(primary, name, path)
+                    return RoutedAnswer(task.result(), name, path)
+                errors.append(task.exception())
+
+            # ✅ Primary too slow (nothing done) or failed: ask the other backend too
+            if secondary is not None:
+                path = "fallback" if done else "hedge"
+                tasks[asyncio.create_task(_timed_call(secondary, transcript_text, question))] = secondary
+                secondary = None
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    metrics.llm_routes_total.inc(primary, "none", path)
+    raise next((error for error in errors if isinstance(error, LLMError)), errors[0])
+
@@ -0,0 +1,235 @@
+import os
+import re
+import uuid
+import wave
+import struct
+import asyncio
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from utils.asr import SUMMARY_NOT_AVAILABLE, TranscriptionResult, transcribe_path
+from utils.batching import map_bounded
+from utils.metrics import span
+from utils.uploads import UPLOAD_DIR, remove_quietly
+
+if TYPE_CHECKING:
+    from deepgram import DeepgramClient, PrerecordedOptions
+
+load_dotenv()
+
+# Target length of one segment; cuts are moved back to the quietest point before it
+LONG_MEDIA_SEGMENT_SECONDS = float(os.getenv("LONG_MEDIA_SEGMENT_SECONDS", "300"))
+# How far before the target a cut may move looking for silence
+LONG_MEDIA_SEARCH_SECONDS = float(os.getenv("LONG_MEDIA_SEARCH_SECONDS", "30"))
+# Audio shared by neighbouring segments, so a word at a cut is heard whole at least once
+LONG_MEDIA_OVERLAP_SECONDS = float(os.getenv("LONG_MEDIA_OVERLAP_SECONDS", "2"))
+# Recordings shorter than this go to Deepgram as a single request
+LONG_MEDIA_MIN_SECONDS = float(os.getenv("LONG_MEDIA_MIN_SECONDS", "600"))
+LONG_MEDIA_CONCURRENCY = int(os.getenv("LONG_MEDIA_CONCURRENCY", "8"))
+LONG_MEDIA_SEGMENT_RETRIES = int(os.getenv("LONG_MEDIA_SEGMENT_RETRIES", "2"))
+LONG_MEDIA_RETRY_BACKOFF_SECONDS = float(os.getenv("LONG_MEDIA_RETRY_BACKOFF_SECONDS", "1"))
+
+ENERGY_FRAME_SECONDS = 0.02
+# Quietest stretch is judged over this window, so a cut lands in a pause, not between two syllables
+ENERGY_SMOOTHING_SECONDS = 0.3
+WRITE_BLOCK_SECONDS = 10
+# Matches of fewer words in an overlap are treated as coincidence
+MIN_OVERLAP_MATCH_WORDS = 2
+
+_SAMPLE_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+_NON_WORD_RE = re.compile(r"[^\w']+")
+
+
+class WavLayout(NamedTuple):
+    channels: int
+    sample_rate: int
+    sample_width: int
+    data_offset: int
+    frames: int
+
+
+def read_wav_layout(file_path: str) -> Optional[WavLayout]:
+    """Format and position of the sample data of a PCM WAV file; None for anything else.
+
+    Only 8, 16 and 32-bit integer PCM is handled; other media is transcribed
+    in one request.
+    """
+    with open(file_path, "rb") as audio:
+        header = audio.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+
+        fmt = None
+        while True:
+            chunk = audio.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+
+            if chunk_id == b"fmt ":
+                body = audio.read(size)
+                if len(body) < 16:
+                    return None
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if audio_format == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    audio_format = struct.unpack("<H", body[24:26])[0]
+                if audio_format != _WAVE_FORMAT_PCM or bits // 8 not in _SAMPLE_DTYPES or not channels:
+                    return None
+                fmt = (channels, sample_rate, bits // 8)
+                audio.seek(size & 1, os.SEEK_CUR)
+
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                channels, sample_rate, sample_width = fmt
+                data_offset = audio.tell()
+                # Streamed recorders often leave the size as 0 or 0xFFFFFFFF; trust the file instead
+                available = os.fstat(audio.fileno()).st_size - data_offset
+                size = available if size in (0, 0xFFFFFFFF) else min(size, available)
+                return WavLayout(channels, sample_rate, sample_width, data_offset, size // (channels * sample_width))
+
+            else:
+                audio.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def open_samples(file_path: str, layout: WavLayout) -> np.ndarray:
+    """Memory-mapped (frames, channels) view of the samples; nothing is read until sliced."""
+    return np.memmap(file_path, dtype=_SAMPLE_DTYPES[layout.sample_width], mode="r",
+                     offset=layout.data_offset, shape=(layout.frames, layout.channels))
+
+
+def quietest_frame(samples: np.ndarray, sample_rate: int, start: int, end: int) -> int:
+    """Frame index in ``[start, end)`` at the centre of the lowest-energy stretch."""
+    hop = max(1, int(sample_rate * ENERGY_FRAME_SECONDS))
+    window = samples[start:end].astype(np.float32).mean(axis=1)
+    if samples.dtype == np.uint8:
+        window -= 128
+    hops = len(window) // hop
+    if hops == 0:
+        return end
+
+    energy = np.square(window[:hops * hop]).reshape(hops, hop).mean(axis=1)
+    smoothing = max(1, int(ENERGY_SMOOTHING_SECONDS / ENERGY_FRAME_SECONDS))
+    if hops > smoothing:
+        energy = np.convolve(energy, np.ones(smoothing) / smoothing, mode="same")
+    return start + int(np.argmin(energy)) * hop + hop // 2
+
+
+def plan_segments(samples: np.ndarray, sample_rate: int) -> List[Tuple[int, int]]:
+    """(start, end) frames of overlapping segments, cut at pauses."""
+    frames = len(samples)
+    segment = int(LONG_MEDIA_SEGMENT_SECONDS * sample_rate)
+    search = min(int(LONG_MEDIA_SEARCH_SECONDS * sample_rate), segment // 2)
+    overlap = int(LONG_MEDIA_OVERLAP_SECONDS * sample_rate)
+
+    cuts = [0]
+    while frames - cuts[-1] > segment:
+        target = cuts[-1] + segment
+        cuts.append(quietest_frame(samples, sample_rate, target - search, target))
+    cuts.append(frames)
+    return [(max(0, start - overlap), min(frames, end + overlap)) for start, end in zip(cuts, cuts[1:])]
+
+
+def write_segment(samples: np.ndarray, layout: WavLayout, start: int, end: int) -> str:
+    """Copy frames ``[start, end)`` to a new WAV file in bounded blocks and return its path."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    segment_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.wav")
+    block = int(WRITE_BLOCK_SECONDS * layout.sample_rate)
+    try:
+        with wave.open(segment_path, "wb") as segment:
+            segment.setnchannels(layout.channels)
+            segment.setsampwidth(layout.sample_width)
+            segment.setframerate(layout.sample_rate)
+            for first in range(start, end, block):
+                segment.writeframes(np.ascontiguousarray(samples[first:min(end, first + block)]).tobytes())
+    except BaseException:
+        remove_quietly(segment_path)
+        raise
+    return segment_path
+
+
+def _normalise(word: str) -> str:
+    return _NON_WORD_RE.sub("", word.lower())
+
+
+def stitch_transcripts(transcripts: List[str], overlap_words: int) -> str:
+    """Join segment transcripts, dropping the words both sides of an overlap recognised.
+
+    The longest common run of words between the end of one segment and the
+    start of the next (ignoring case and punctuation) is kept once: the earlier
+    segment's words up to the run, then the later segment's words after it.
+    """
+    words: List[str] = []
+    for text in transcripts:
+        incoming = text.split()
+        if words and incoming:
+            tail, head = words[-overlap_words:], incoming[:overlap_words]
+            match = SequenceMatcher(
+                None, [_normalise(word) for word in tail], [_normalise(word) for word in head], autojunk=False
+            ).find_longest_match(0, len(tail), 0, len(head))
+            if match.size >= MIN_OVERLAP_MATCH_WORDS:
+                del words[len(words) - len(tail) + match.a + match.size:]
+                incoming = incoming[match.b + match.size:]
+        words.extend(incoming)
+    return " ".join(words)
+
+
+def overlap_word_window() -> int:
+    """Words to compare at each seam: generously more than fit in the overlap."""
+    return max(8, int(LONG_MEDIA_OVERLAP_SECONDS * 2 * 4))
+
+
+async def transcribe_segment(file_path: str, layout: WavLayout, bounds: Tuple[int, int],
+                             options: "PrerecordedOptions", deepgram: Optional["DeepgramClient"]) -> TranscriptionResult:
+    """Cut one segment to its own file and transcribe it, retrying just this segment on failure."""
+    samples = open_samples(file_path, layout)
+    segment_path = await asyncio.to_thread(write_segment, samples, layout, *bounds)
+    try:
+        for attempt in range(LONG_MEDIA_SEGMENT_RETRIES + 1):
+            try:
+                return await transcribe_path(segment_path, options, deepgram)
+            except Exception as e:
+                if attempt == LONG_MEDIA_SEGMENT_RETRIES:
+                    raise
+                start_seconds = bounds[0] / layout.sample_rate
+                print(f"Segment at {start_seconds:.0f}s failed ({str(e)}), retrying")
+                await asyncio.sleep(LONG_MEDIA_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    finally:
+        remove_quietly(segment_path)
+
+
+async def transcribe_long_media(file_path: str, options: "PrerecordedOptions",
+                                deepgram: Optional["DeepgramClient"] = None) -> Optional[TranscriptionResult]:
+    """Transcribe a long PCM WAV recording as concurrent segments and stitch the results.
+
+    Returns None when the file isn't PCM WAV or is shorter than
+    LONG_MEDIA_MIN_SECONDS; the caller then sends it as one request. At most
+    LONG_MEDIA_CONCURRENCY segments (and segment files) are in flight at once.
+    The summary is the segments' summaries joined in order.
+    """
+    layout = await asyncio.to_thread(read_wav_layout, file_path)
+    if layout is None or layout.frames < LONG_MEDIA_MIN_SECONDS * layout.sample_rate:
+        return None
+
+    with span("long_media_transcribe"):
+        samples = open_samples(file_path, layout)
+        segments = await asyncio.to_thread(plan_segments, samples, layout.sample_rate)
+        print(f"Transcribing {layout.frames / layout.sample_rate:.0f}s of audio as {len(segments)} segments...")
+
+        outcomes = await map_bounded(
+            lambda bounds: transcribe_segment(file_path, layout, bounds, options, deepgram),
+            segments,
+            LONG_MEDIA_CONCURRENCY,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+    summaries = [result.summary for result in outcomes if result.summary != SUMMARY_NOT_AVAILABLE]
+    return TranscriptionResult(
+        transcript=stitch_transcripts([result.transcript for result in outcomes], overlap_word_window()),
+        summary=" ".join(summaries) or SUMMARY_NOT_AVAILABLE,
+    )
@@ -0,0 +1,290 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from pymongo import monitoring
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add a Server-Timing header (per-span durations) to every response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+# A loop stalled longer than this is reported, with the stack of whatever is blocking it
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _label_text(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def expose(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {count}" for values, count in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + amount
+
+    def dec(self, *values: str) -> None:
+        self.inc(*values, amount=-1.0)
+
+    def set(self, value: float, *values: str) -> None:
+        with self._lock:
+            self._values[values] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {value}" for values, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        with self._lock:
+            counts = self._counts.get(values)
+            if counts is None:
+                counts = self._counts[values] = [0] * (len(self.buckets) + 1)
+                self._sums[values] = 0.0
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[values] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+                lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {self._sums[values]}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+http_request_seconds = Histogram("http_request_duration_seconds", "Time to response headers, per route.",
+                                 ("method", "route"))
+http_requests_total = Counter("http_requests_total", "Completed requests by route and status.",
+                              ("method", "route", "status"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled.", ("method",))
+span_seconds = Histogram("span_duration_seconds", "Time spent in instrumented external calls.", ("span",))
+span_errors_total = Counter("span_errors_total", "Instrumented calls that raised.", ("span",))
+mongo_command_seconds = Histogram("mongo_command_duration_seconds", "MongoDB command round trips.",
+                                  ("command",))
+mongo_command_failures_total = Counter("mongo_command_failures_total", "MongoDB commands that failed.",
+                                       ("command",))
+event_loop_lag_seconds = Histogram("event_loop_lag_seconds", "How late the loop-lag probe woke up.",
+                                   buckets=LAG_BUCKETS)
+admission_in_flight = Gauge("admission_in_flight", "Admission slots held in this worker.", ("kind",))
+admission_waiting = Gauge("admission_waiting", "Requests queued for an admission slot in this worker.", ("kind",))
+admission_rejections_total = Counter("admission_rejections_total", "Requests turned away by admission control.",
+                                     ("kind", "reason"))
+event_loop_stalls_total = Counter("event_loop_stalls_total", f"Loop stalls longer than {LOOP_LAG_WARN_MS:g} ms.")
+llm_backend_seconds = Histogram("llm_backend_duration_seconds", "Chat answer calls per backend and outcome.",
+                                ("backend", "outcome"))
+llm_routes_total = Counter("llm_routes_total", "Chat answers by primary backend, winning backend and path.",
+                           ("primary", "winner", "path"))
+llm_backend_p95_seconds = Gauge("llm_backend_p95_seconds", "Recent p95 latency the chat router sees.", ("backend",))
+llm_backend_error_rate = Gauge("llm_backend_error_rate", "Recent error rate the chat router sees.", ("backend",))
+llm_backend_healthy = Gauge("llm_backend_healthy", "1 unless the backend is in failure cooldown.", ("backend",))
+llm_local_model_loaded = Gauge("llm_local_model_loaded", "1 once the local QA model is loaded and routable.")
+qa_batch_size = Histogram("qa_batch_size", "Requests answered per local QA forward pass.", ("batcher",),
+                          buckets=BATCH_SIZE_BUCKETS)
+qa_batch_seconds = Histogram("qa_batch_duration_seconds", "Time per local QA forward pass.", ("batcher",))
+qa_queue_depth = Gauge("qa_queue_depth", "Requests waiting for a local QA batch.", ("batcher",))
+cache_lookups_total = Counter("cache_lookups_total", "In-process cache lookups by cache and result.",
+                              ("cache", "result"))
+cache_entries = Gauge("cache_entries", "Entries held by each in-process cache.", ("cache",))
+answer_cache_requests_total = Counter("answer_cache_requests_total",
+                                      "Chat answers by where they came from: either cache tier, "
+                                      "a concurrent identical request, or a fresh upstream call.", ("source",))
+
+REGISTRY: List[_Metric] = [
+    http_request_seconds, http_requests_total, http_requests_in_flight, span_seconds, span_errors_total,
+    mongo_command_seconds, mongo_command_failures_total, event_loop_lag_seconds, event_loop_stalls_total,
+    admission_in_flight, admission_waiting, admission_rejections_total, llm_backend_seconds, llm_routes_total,
+    llm_backend_p95_seconds, llm_backend_error_rate, llm_backend_healthy, llm_local_model_loaded, qa_batch_size, qa_batch_seconds,
+    qa_queue_depth, cache_lookups_total, cache_entries, answer_cache_requests_total,
+]
+
+# Per-request span totals for Server-Timing: name -> [seconds, calls]
+_request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.expose()) + "\n"
+
+
+def start_request_timings() -> Dict[str, List[float]]:
+    """Begin collecting span durations for the current request (read back for Server-Timing)."""
+    timings: Dict[str, List[float]] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def _add_request_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        total = timings.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block (sync or async code) as ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        span_errors_total.inc(name)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        span_seconds.observe(seconds, name)
+        _add_request_timing(name, seconds)
+
+
+def server_timing_header(timings: Dict[str, List[float]], total_seconds: float) -> str:
+    entries = [f'{name};dur={seconds * 1000:.1f};desc="{int(calls)}x"' for name, (seconds, calls) in timings.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command; passed to the client as an event listener.
+
+    The async driver calls listeners inline on the task that issued the
+    command, so the timings also land in that request's Server-Timing.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_seconds.observe(seconds, event.command_name)
+        _add_request_timing("mongo", seconds)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        mongo_command_seconds.observe(event.duration_micros / 1_000_000, event.command_name)
+        mongo_command_failures_total.inc(event.command_name)
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and reports what is blocking the loop.
+
+    A task on the loop sleeps LOOP_LAG_INTERVAL_SECONDS and records how late it
+    wakes up. A watchdog thread notices when that heartbeat stops for longer
+    than LOOP_LAG_WARN_MS and prints the loop thread's current stack, which
+    points straight at the blocking call while it is still running.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = 0
+
+    async def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _probe(self) -> None:
+        while True:
+            expected = time.monotonic() + LOOP_LAG_INTERVAL_SECONDS
+            await asyncio.sleep(LOOP_LAG_INTERVAL_SECONDS)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            event_loop_lag_seconds.observe(lag)
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        threshold = LOOP_LAG_WARN_MS / 1000
+        reported_for = None
+        while not self._stopped.wait(threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - LOOP_LAG_INTERVAL_SECONDS
+            if stalled <= threshold or reported_for == heartbeat:
+                continue
+            # One report per stall, taken while the blocking call is on the stack
+            reported_for = heartbeat
+            event_loop_stalls_total.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            print(f"Event loop blocked for over {stalled * 1000:.0f} ms; loop thread is at:\n{stack}")
+
+
+loop_lag_monitor = LoopLagMonitor()
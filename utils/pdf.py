@@ -0,0 +1,116 @@
+import os
+import math
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from utils.metrics import span
+
+load_dotenv()
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# Smallest page range worth a task: every task parses the whole document before extracting its pages
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+# Page ranges extracted ahead of the consumer; bounds the text held in flight
+PDF_PREFETCH_TASKS = int(os.getenv("PDF_PREFETCH_TASKS", str(PDF_WORKERS * 2)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class ExtractedPdf:
+    """Full text of a PDF plus the character offset where each page starts."""
+
+    text: str
+    page_offsets: List[int] = field(default_factory=list)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    def page(self, number: int) -> str:
+        """Text of page ``number`` (0-based), sliced out of the joined text."""
+        start = self.page_offsets[number]
+        end = self.page_offsets[number + 1] if number + 1 < len(self.page_offsets) else len(self.text)
+        return self.text[start:end]
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool for page extraction, created on first use."""
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the parent has live event-loop and driver threads
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown() -> None:
+    """Stop the worker processes. Called from the app lifespan."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _page_count(pdf_path: str) -> int:
+    # PyPDF2 is imported here and below so only the pool processes pay for it
+    from PyPDF2 import PdfReader # type: ignore
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process; each task opens (and so parses) its own reader
+    from PyPDF2 import PdfReader # type: ignore
+
+    reader = PdfReader(pdf_path)
+    return [reader.pages[number].extract_text() or "" for number in range(start, stop)]
+
+
+async def iter_pdf_pages(pdf_path: str) -> AsyncIterator[Tuple[int, str]]:
+    """Yield ``(page_number, text)`` in page order while later pages are still extracting.
+
+    Pages are extracted in contiguous ranges on the process pool, one per
+    worker (but at least PDF_PAGES_PER_TASK pages each). Opening a reader
+    parses the whole document, so a fixed small range size would make total
+    work grow with the square of the page count.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    page_count = await loop.run_in_executor(executor, _page_count, pdf_path)
+
+    pages_per_task = max(PDF_PAGES_PER_TASK, math.ceil(page_count / PDF_WORKERS))
+    ranges = deque(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    pending: deque = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < PDF_PREFETCH_TASKS:
+                start, stop = ranges.popleft()
+                pending.append((start, loop.run_in_executor(executor, _extract_range, pdf_path, start, stop)))
+
+            start, future = pending.popleft()
+            for offset, text in enumerate(await future):
+                yield start + offset, text
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+async def extract_pdf(pdf_path: str) -> ExtractedPdf:
+    """Extract all pages in parallel and join them once, recording page offsets."""
+    pages: List[str] = []
+    page_offsets: List[int] = []
+    length = 0
+    with span("pdf_extract"):
+        async for _, text in iter_pdf_pages(pdf_path):
+            page_offsets.append(length)
+            length += len(text)
+            pages.append(text)
+
+    return ExtractedPdf(text="".join(pages), page_offsets=page_offsets)
@@ -0,0 +1,169 @@
+import os
+import re
+import asyncio
+from collections import Counter
+from typing import List, Optional
+import numpy as np
+from pymongo import ASCENDING
+from dotenv import load_dotenv
+from utils import db, answer_cache
+
+load_dotenv()
+
+CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP_WORDS", "30"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_CONTEXT_TOKENS", "1500"))
+
+# Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WORD_RE = re.compile(r"\S+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have how i in is it its "
+    "of on or our so that the their them there they this to was we were what when where "
+    "which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms without stopwords."""
+    return [term for term in _TOKEN_RE.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def estimate_tokens(char_count: int) -> int:
+    """Rough LLM token count for ``char_count`` characters (~4 per token in English)."""
+    return char_count // 4 + 1
+
+
+def chunk_text(text: str, page_offsets: Optional[List[int]] = None) -> List[dict]:
+    """Split text into overlapping word windows, keeping character offsets (and pages)."""
+    spans = [match.span() for match in _WORD_RE.finditer(text)]
+    step = max(1, CHUNK_WORDS - CHUNK_OVERLAP_WORDS)
+
+    chunks = []
+    for first in range(0, len(spans), step):
+        window = spans[first:first + CHUNK_WORDS]
+        start, end = window[0][0], window[-1][1]
+        chunk = {"index": len(chunks), "start": start, "end": end, "text": text[start:end]}
+        if page_offsets:
+            chunk["page"] = int(np.searchsorted(page_offsets, start, side="right")) - 1
+        chunks.append(chunk)
+        if first + CHUNK_WORDS >= len(spans):
+            break
+    return chunks
+
+
+def build_chunks(transcript_id: str, user_id: str, text: str,
+                 page_offsets: Optional[List[int]] = None) -> List[dict]:
+    """Chunk documents with per-chunk term frequencies, ready to insert."""
+    chunks = chunk_text(text, page_offsets)
+    for chunk in chunks:
+        terms = tokenize(chunk["text"])
+        chunk.update({
+            "transcript_id": transcript_id,
+            "user_id": user_id,
+            "terms": dict(Counter(terms)),
+            "length": len(terms),
+        })
+    return chunks
+
+
+async def index_transcript(transcript_id: str, user_id: str, text: str,
+                           page_offsets: Optional[List[int]] = None) -> int:
+    """Chunk a transcript and persist per-chunk term frequencies. Returns the chunk count."""
+    # Chunking and counting a long PDF takes most of a second, so keep it off the event loop
+    chunks = await asyncio.to_thread(build_chunks, transcript_id, user_id, text, page_offsets)
+
+    await db.transcript_chunks().delete_many({"transcript_id": transcript_id})
+    # Answers were produced from the old chunks
+    await answer_cache.invalidate_transcript(transcript_id)
+    if chunks:
+        await db.transcript_chunks().insert_many(chunks, ordered=False)
+    return len(chunks)
+
+
+async def try_index_transcript(transcript_id: str, user_id: str, text: str,
+                               page_offsets: Optional[List[int]] = None) -> None:
+    """``index_transcript`` for ingest: a failure is logged, and /chat rebuilds the index on first use."""
+    try:
+        await index_transcript(transcript_id, user_id, text, page_offsets)
+    except Exception as e:
+        print(f"Indexing transcript {transcript_id} failed, /chat will rebuild it: {str(e)}")
+
+
+def bm25_scores(query_terms: List[str], chunk_terms: List[dict], chunk_lengths: np.ndarray) -> np.ndarray:
+    """BM25 score of every chunk for the query, vectorised over chunks x query terms."""
+    vocabulary = list(dict.fromkeys(query_terms))
+    tf = np.array([[terms.get(term, 0) for term in vocabulary] for terms in chunk_terms], dtype=np.float64)
+
+    n_chunks = len(chunk_terms)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_chunks - df + 0.5) / (df + 0.5))
+    average_length = chunk_lengths.mean() if n_chunks else 0.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk_lengths / max(average_length, 1e-9))
+
+    return ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def _within_budget(ordered_indexes, lengths: dict, budget: int) -> List[int]:
+    chosen, used = [], 0
+    for index in ordered_indexes:
+        if used + lengths[index] > budget and chosen:
+            break
+        chosen.append(index)
+        used += lengths[index]
+    return chosen
+
+
+def _rank_chunks(rows: List[dict], question: str, top_k: int, token_budget: int) -> List[int]:
+    """Indexes of the chunks to put in the prompt for ``question``, in transcript order."""
+    chunk_tokens = {row["index"]: estimate_tokens(row["end"] - row["start"]) for row in rows}
+    query_terms = tokenize(question)
+    scores = bm25_scores(query_terms, [row["terms"] for row in rows],
+                         np.array([row["length"] for row in rows], dtype=np.float64)) if query_terms else None
+
+    if scores is not None and scores.max() > 0:
+        ranked = [rows[i]["index"] for i in np.argsort(-scores, kind="stable")[:top_k] if scores[i] > 0]
+    else:
+        spread = np.linspace(0, len(rows) - 1, num=min(top_k, len(rows))).round().astype(int)
+        ranked = [rows[i]["index"] for i in dict.fromkeys(spread.tolist())]
+
+    # Keep transcript order in the prompt so the selected passages read naturally
+    return sorted(_within_budget(ranked, chunk_tokens, token_budget))
+
+
+async def select_contexts(transcript_id: str, user_id: str, questions: List[str], top_k: int = TOP_K,
+                          token_budget: int = CONTEXT_TOKEN_BUDGET) -> Optional[List[str]]:
+    """``select_context`` for several questions with two queries in total.
+
+    Chunk statistics are read once and every question ranked against them;
+    the text of all chosen chunks is then fetched in one query.
+    """
+    rows = await db.transcript_chunks().find(
+        {"transcript_id": transcript_id, "user_id": user_id}, {"_id": 0, "index": 1, "terms": 1, "length": 1, "start": 1, "end": 1}
+    ).sort("index", ASCENDING).to_list(length=None)
+    if not rows:
+        return None
+
+    chosen = [_rank_chunks(rows, question, top_k, token_budget) for question in questions]
+    needed = sorted({index for indexes in chosen for index in indexes})
+    texts = await db.transcript_chunks().find(
+        {"transcript_id": transcript_id, "user_id": user_id, "index": {"$in": needed}}, {"_id": 0, "index": 1, "text": 1}
+    ).to_list(length=None)
+    text_of = {row["index"]: row["text"] for row in texts}
+    return ["\n...\n".join(text_of[index] for index in indexes if index in text_of) for indexes in chosen]
+
+
+async def select_context(transcript_id: str, user_id: str, question: str, top_k: int = TOP_K,
+                         token_budget: int = CONTEXT_TOKEN_BUDGET) -> Optional[str]:
+    """Best-matching chunks of ``user_id``'s transcript for ``question`` within ``token_budget``.
+
+    Returns None when the transcript has not been indexed yet (or belongs to
+    someone else). Questions with no
+    matching terms ("summarize this") get evenly spaced chunks instead.
+    """
+    contexts = await select_contexts(transcript_id, user_id, [question], top_k, token_budget)
+    return None if contexts is None else contexts[0]
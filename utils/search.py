@@ -0,0 +1,121 @@
+import os
+import re
+from bisect import bisect_right
+from typing import List, Optional
+from dotenv import load_dotenv
+from utils import db
+from utils.retrieval import tokenize
+
+load_dotenv()
+
+# Characters of context kept on each side of the first match in a snippet
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "120"))
+
+_QUOTED_RE = re.compile(r'(-?)"([^"]*)"')
+# -word excludes a term, so it's never highlighted
+_EXCLUDED_RE = re.compile(r"(?:^|\s)-\S+")
+
+
+def search_pipeline(user_id: str, query: str, skip: int, limit: int) -> list:
+    """Ranked transcripts of ``user_id`` matching ``query``, best chunk of each.
+
+    Uses the (user_id, text) text index on transcript_chunks, so only that
+    user's postings are read. Chunks overlap, so a transcript's score is its
+    best chunk's; ``matching_chunks`` says how much of it matched.
+    """
+    return [
+        {"$match": {"user_id": user_id, "$text": {"$search": query}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "index": 1}},
+        {"$group": {
+            "_id": "$transcript_id",
+            "score": {"$first": "$score"},
+            "matching_chunks": {"$sum": 1},
+            "text": {"$first": "$text"},
+            "start": {"$first": "$start"},
+            "page": {"$first": "$page"},
+        }},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+
+
+def query_terms(query: str) -> List[str]:
+    """Terms to highlight: quoted phrases whole, then the remaining words; excluded ones are left out."""
+    phrases = [phrase.strip() for negated, phrase in _QUOTED_RE.findall(query) if not negated and phrase.strip()]
+    return phrases + tokenize(_EXCLUDED_RE.sub(" ", _QUOTED_RE.sub(" ", query)))
+
+
+def make_snippet(text: str, terms: List[str]) -> dict:
+    """Excerpt of ``text`` around the first query term and that term's offset within ``text``.
+
+    Terms match as word prefixes, case-insensitively, so "budget" finds
+    "budgets" the way the stemmed text index did.
+    """
+    match = None
+    if terms:
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")", re.IGNORECASE)
+        match = pattern.search(text)
+    position = match.start() if match else 0
+
+    start = max(0, position - SEARCH_SNIPPET_CHARS)
+    end = min(len(text), (match.end() if match else 0) + SEARCH_SNIPPET_CHARS)
+    # Don't cut words in half at either edge
+    if start > 0:
+        space = text.find(" ", start, position)
+        start = space + 1 if space != -1 else start
+    if end < len(text):
+        space = text.rfind(" ", position, end)
+        end = space if space > position else end
+    snippet = text[start:end].strip()
+    return {
+        "snippet": ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else ""),
+        "match_offset": position,
+    }
+
+
+def page_of(offset: int, page_offsets: Optional[List[int]]) -> Optional[int]:
+    if not page_offsets:
+        return None
+    return bisect_right(page_offsets, offset) - 1
+
+
+async def search(user_id: str, query: str, limit: int, offset: int) -> dict:
+    """One page of ranked hits: transcript metadata, score, snippet and character offset (and page)."""
+    rows = await db.transcript_chunks().aggregate(search_pipeline(user_id, query, offset, limit + 1))
+    hits = await rows.to_list(length=None)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    metadata = {}
+    if hits:
+        cursor = db.transcriptions().find(
+            {"transcript_id": {"$in": [hit["_id"] for hit in hits]}},
+            {"_id": 0, "transcript_id": 1, "filename": 1, "created_at": 1, "page_offsets": 1},
+        )
+        metadata = {entry["transcript_id"]: entry async for entry in cursor}
+
+    terms = query_terms(query)
+    results = []
+    for hit in hits:
+        entry = metadata.get(hit["_id"], {})
+        snippet = make_snippet(hit["text"], terms)
+        transcript_offset = hit["start"] + snippet["match_offset"]
+        page = page_of(transcript_offset, entry.get("page_offsets"))
+        results.append({
+            "transcript_id": hit["_id"],
+            "filename": entry.get("filename"),
+            "created_at": entry.get("created_at"),
+            "score": round(hit["score"], 4),
+            "matching_chunks": hit["matching_chunks"],
+            "snippet": snippet["snippet"],
+            "offset": transcript_offset,
+            "page": page if page is not None else hit.get("page"),
+        })
+
+    return {
+        "query": query,
+        "results": results,
+        "next_offset": offset + limit if has_more else None,
+    }
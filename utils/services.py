@@ -0,0 +1,60 @@
+import inspect
+import threading
+from typing import Any, Callable, Dict
+
+
+class ServiceRegistry:
+    """Lazily constructed, process-wide external clients.
+
+    Modules register a factory under a name at import time (cheap); the client
+    itself, and the heavy SDK imports its factory performs, only happen the
+    first time something asks for it. Routers get services through FastAPI
+    ``Depends(provide(name))``, so tests and benchmarks can swap them with
+    ``app.dependency_overrides``.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Return the service, building it on first use."""
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = self._factories[name]()
+        return instance
+
+    def override(self, name: str, instance: Any) -> None:
+        """Use ``instance`` instead of building the service (for scripts and fakes)."""
+        self._instances[name] = instance
+
+    async def close(self) -> None:
+        """Close every service that was actually built. Called from the app lifespan."""
+        instances, self._instances = self._instances, {}
+        for instance in instances.values():
+            closer = getattr(instance, "aclose", None) or getattr(instance, "close", None)
+            if closer is None:
+                continue
+            result = closer()
+            if inspect.isawaitable(result):
+                await result
+
+
+registry = ServiceRegistry()
+
+
+def provide(name: str) -> Callable[[], Any]:
+    """FastAPI dependency returning the named service."""
+
+    def dependency() -> Any:
+        return registry.get(name)
+
+    dependency.__name__ = f"provide_{name}"
+    return dependency
@@ -0,0 +1,94 @@
+import os
+import zlib
+import asyncio
+from typing import AsyncIterator, List, Optional
+from bson import Binary
+from pymongo import ASCENDING, ReplaceOne
+from dotenv import load_dotenv
+from utils import db
+
+load_dotenv()
+
+# Characters of text per body chunk. Each chunk is compressed on its own, so a
+# chunk's document stays far below MongoDB's 16 MB limit whatever the transcript size.
+TRANSCRIPT_BODY_CHUNK_CHARS = int(os.getenv("TRANSCRIPT_BODY_CHUNK_CHARS", str(1024 * 1024)))
+TRANSCRIPT_COMPRESSION_LEVEL = int(os.getenv("TRANSCRIPT_COMPRESSION_LEVEL", "6"))
+BODY_CODEC = "zlib"
+
+
+def compress_body(text: str) -> List[bytes]:
+    """Split text into TRANSCRIPT_BODY_CHUNK_CHARS pieces and zlib-compress each one."""
+    return [
+        zlib.compress(text[start:start + TRANSCRIPT_BODY_CHUNK_CHARS].encode("utf-8"), TRANSCRIPT_COMPRESSION_LEVEL)
+        for start in range(0, len(text), TRANSCRIPT_BODY_CHUNK_CHARS)
+    ]
+
+
+async def save_body(transcript_id: str, text: str) -> dict:
+    """Store a transcript body as compressed chunks; returns the fields to put on its metadata doc.
+
+    Call this before inserting the metadata so readers never see a transcript without a body.
+    """
+    # zlib releases the GIL, so compressing a large body in a thread keeps the loop free
+    compressed = await asyncio.to_thread(compress_body, text)
+    await db.transcript_bodies().delete_many({"transcript_id": transcript_id})
+    if compressed:
+        await db.transcript_bodies().insert_many(
+            [
+                {"transcript_id": transcript_id, "seq": seq, "codec": BODY_CODEC, "data": Binary(data)}
+                for seq, data in enumerate(compressed)
+            ],
+            ordered=False,
+        )
+    return {
+        "transcript_length": len(text),
+        "body_chunks": len(compressed),
+        "body_bytes": sum(len(data) for data in compressed),
+    }
+
+
+async def save_metadata(entries: List[dict]) -> None:
+    """Store transcript metadata documents, replacing any saved earlier under the same transcript_id.
+
+    A retried job saves the same transcript_ids again, so it overwrites its
+    earlier partial work instead of duplicating it.
+    """
+    await db.transcriptions().bulk_write(
+        [ReplaceOne({"transcript_id": entry["transcript_id"]}, entry, upsert=True) for entry in entries],
+        ordered=False,
+    )
+
+
+async def iter_body(transcript_id: str) -> AsyncIterator[str]:
+    """Decompressed body chunks in order, fetched one at a time."""
+    cursor = db.transcript_bodies().find(
+        {"transcript_id": transcript_id}, {"data": 1, "_id": 0}, sort=[("seq", ASCENDING)], batch_size=1
+    )
+    async for chunk in cursor:
+        yield (await asyncio.to_thread(zlib.decompress, chunk["data"])).decode("utf-8")
+
+
+async def load_body(transcript_id: str) -> str:
+    return "".join([part async for part in iter_body(transcript_id)])
+
+
+async def load_text(entry: dict) -> str:
+    """Full text of a transcript metadata document.
+
+    Documents written before bodies were split out (and not yet migrated)
+    still carry the text inline under ``transcript``.
+    """
+    if "transcript" in entry:
+        return entry["transcript"]
+    return await load_body(entry["transcript_id"])
+
+
+async def attach_text(entry: Optional[dict]) -> Optional[dict]:
+    """Fill in ``transcript`` on a metadata document, so responses keep their old shape."""
+    if entry is not None and "transcript" not in entry:
+        entry["transcript"] = await load_body(entry["transcript_id"])
+    return entry
+
+
+async def delete_body(transcript_id: str) -> None:
+    await db.transcript_bodies().delete_many({"transcript_id": transcript_id})
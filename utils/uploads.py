@@ -0,0 +1,105 @@
+import os
+import uuid
+import hashlib
+from typing import List, Optional
+import aiofiles
+from fastapi import HTTPException, Request, UploadFile
+from dotenv import load_dotenv
+from utils.batching import error_status
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "temp")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Per file: enforced while spooling each upload, and on the Content-Length of single-file requests
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "50"))
+# Whole request: the Content-Length cap for batch uploads, whose files are each held to MAX_UPLOAD_BYTES
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(8 * 1024 * 1024 * 1024)))
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload exceeds the maximum size of {MAX_UPLOAD_BYTES} bytes",
+    )
+
+
+def request_upload_limit(request: Request) -> int:
+    """Largest body accepted for this request: the batch total on batch endpoints, else one file's."""
+    return MAX_BATCH_UPLOAD_BYTES if request.url.path.endswith("/batch") else MAX_UPLOAD_BYTES
+
+
+def declared_length_too_large(request: Request, max_bytes: Optional[int] = None) -> bool:
+    """True when the request's Content-Length already exceeds the upload limit."""
+    max_bytes = request_upload_limit(request) if max_bytes is None else max_bytes
+    content_length = request.headers.get("content-length")
+    return content_length is not None and content_length.isdigit() and int(content_length) > max_bytes
+
+
+async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None, hasher=None) -> str:
+    """Copy an upload to a uniquely named file in fixed-size chunks and return its path.
+
+    Memory use stays at one chunk regardless of the upload size. The partial
+    file is removed and 413 raised as soon as ``max_bytes`` is exceeded. If a
+    ``hashlib`` object is passed as ``hasher`` it is fed every chunk, so the
+    content digest comes for free with the copy.
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large()
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Never trust the client filename for the path; keep only its extension
+    suffix = os.path.splitext(file.filename or "")[1][:16]
+    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}{suffix}")
+
+    written = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise _too_large()
+                if hasher is not None:
+                    hasher.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        remove_quietly(file_path)
+        raise
+
+    return file_path
+
+
+def check_batch_size(files: list) -> None:
+    """400 for an empty batch or one with more than MAX_BATCH_FILES files."""
+    if not files or len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_BATCH_FILES} files per batch")
+
+
+async def spool_batch(files: List[UploadFile], user_id: str, hash_content: bool = False) -> List[dict]:
+    """Spool every file of a batch; one payload per file, in order.
+
+    A file that can't be spooled (e.g. too large) gets an ``error`` entry
+    instead of a ``file_path`` and doesn't stop the others.
+    """
+    payloads = []
+    for file in files:
+        # The id is fixed here so a retried job stores the file under the same transcript_id
+        payload = {"filename": file.filename, "user_id": user_id, "transcript_id": str(uuid.uuid4())}
+        hasher = hashlib.sha256() if hash_content else None
+        try:
+            payload["file_path"] = await spool_upload(file, hasher=hasher)
+        except HTTPException as e:
+            payload["error"] = error_status(e)
+        else:
+            if hasher is not None:
+                payload["content_sha256"] = hasher.hexdigest()
+        payloads.append(payload)
+    return payloads
+
+
+def remove_quietly(file_path: Optional[str]) -> None:
+    """Delete a spool file if it still exists."""
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)